@@ -1,7 +1,20 @@
+import io
+import heapq
 import random
 import math
 import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from difflib import get_close_matches
+from catalog import CatalogIndex
+from database import atomic_write
+from utils import find_song
+from taste import AI_SCORING, TasteProfile
+
+try:
+    import numpy as np  # optional: vectorized scoring
+except ImportError:
+    np = None
 
 
 # -------------------------------------------------------------
@@ -9,18 +22,99 @@ from difflib import get_close_matches
 # -------------------------------------------------------------
 
 
+# -------------------- CATALOG CACHES --------------------------
+
+_CACHES = {}
+
+
+def catalog_cached(name, songs, factory):
+    """
+    Build factory(songs) once per catalog and reuse it while a
+    Catalog's version is unchanged. Plain lists are rebuilt every call.
+    """
+    version = getattr(songs, "version", None)
+    key = (id(songs), version, len(songs))
+
+    cached = _CACHES.get(name)
+    if cached is None or version is None or cached[0] != key:
+        cached = (key, factory(songs))
+        _CACHES[name] = cached
+
+    return cached[1]
+
+
+
 # -------------------- FUZZY SEARCH ----------------------------
 
+FUZZY_SHORTLIST = 50  # candidates ranked by SequenceMatcher per wanted match
+
+
+def trigrams(text):
+    """
+    Padded, lowercase character trigrams: "abc" -> {"  a", " ab", "abc", "bc "}
+    """
+    text = f"  {text.lower()} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    Inverted index from character trigrams to strings.
+    Shortlists by trigram Dice similarity (overlap relative to both
+    lengths, so long strings don't win on size alone), then ranks only
+    the shortlist with difflib, so scores and cutoff behave like
+    get_close_matches. Strings sharing no trigram with the query are
+    never returned.
+    """
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.sizes = []
+        self.postings = {}
+        for i, key in enumerate(self.keys):
+            grams = trigrams(key)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(i)
+
+    def close_matches(self, query, n=3, cutoff=0.6):
+        grams = trigrams(query)
+        overlap = {}
+        for gram in grams:
+            for i in self.postings.get(gram, ()):
+                overlap[i] = overlap.get(i, 0) + 1
+
+        size = len(grams)
+        sizes = self.sizes
+        shortlist = heapq.nlargest(
+            FUZZY_SHORTLIST * n, overlap, key=lambda i: overlap[i] / (size + sizes[i])
+        )
+        return get_close_matches(query, [self.keys[i] for i in shortlist], n=n, cutoff=cutoff)
+
+
+class FuzzyIndex:
+    """
+    Title and artist trigram indexes for one catalog.
+    """
+
+    def __init__(self, songs):
+        self.titles = {s["Title"]: s for s in songs}
+        self.artists = {s["Artist"]: s for s in songs}
+        self.title_index = TrigramIndex(self.titles)
+        self.artist_index = TrigramIndex(self.artists)
+
+
 def fuzzy_search(query, songs, cutoff=0.55):
     """
     Fuzzy match song titles or artists.
     Returns list of matching songs.
     """
-    titles = {s["Title"]: s for s in songs}
-    artists = {s["Artist"]: s for s in songs}
+    index = catalog_cached("fuzzy", songs, FuzzyIndex)
+    titles = index.titles
+    artists = index.artists
 
-    matches_titles = get_close_matches(query, titles.keys(), cutoff=cutoff)
-    matches_artists = get_close_matches(query, artists.keys(), cutoff=cutoff)
+    matches_titles = index.title_index.close_matches(query, cutoff=cutoff)
+    matches_artists = index.artist_index.close_matches(query, cutoff=cutoff)
 
     results = []
 
@@ -62,6 +156,8 @@ def recommend_by_mood(mood, songs):
         return []
 
     preferred = MOOD_MAP[mood]
+    if isinstance(songs, CatalogIndex):
+        return songs.where("Genre", preferred)
     return [s for s in songs if s["Genre"] in preferred]
 
 
@@ -91,10 +187,19 @@ def similarity(songA, songB):
 
 
 
-def similar_songs(target_song, songs, top_n=5):
+def similar_songs(target_song, songs, top_n=5, index=None):
     """
     Return top N most similar songs.
+    index: optional SimilarityIndex to read precomputed neighbours from.
     """
+    if index is not None:
+        found = index.lookup(target_song, songs, top_n)
+        if found is not None:
+            return found
+
+    if np is not None and songs:
+        return feature_matrix(songs).similar(target_song, top_n)
+
     scored = []
     for s in songs:
         if s["MusicID"] == target_song["MusicID"]:
@@ -108,9 +213,11 @@ def similar_songs(target_song, songs, top_n=5):
 
 # ------------------ FULL AI WEIGHTED RECOMMENDER --------------
 
-def ai_score(song, history, genre_freq, artist_freq, avg_duration):
+def ai_score(song, history, genre_freq, artist_freq, avg_duration, recent=None):
     """
     Computes weighted AI score for each song.
+    recent: {MusicID: penalty} for recently played songs; by default
+    only the very last song is penalized.
     """
     score = 0
 
@@ -124,20 +231,51 @@ def ai_score(song, history, genre_freq, artist_freq, avg_duration):
     score += max(0, 2 - abs(song["Duration"] - avg_duration) / 50)
 
     # 4) Recency bias (avoid recommending the SAME last song)
-    if history and history[-1]["id"] == song["MusicID"]:
+    if recent is not None:
+        score -= recent.get(song["MusicID"], 0)
+    elif history and history[-1]["id"] == song["MusicID"]:
         score -= 5
 
     return score
 
 
 
-def recommend_ai(songs, history):
+def recommend_ai(songs, history, profile=None):
     """
     Full AI recommender using weighted scores.
+    profile: the user's TasteProfile, which saves a pass over history.
+    With MUSIT_AI_SCORING=recency, plays are time-decayed and the
+    profile's recent plays are penalized; cost stays O(catalog).
     """
     if len(history) < 5:
         return None  # AI needs more data
 
+    recent = None
+    if AI_SCORING == "recency":
+        if profile is None:
+            profile = TasteProfile.from_history(history)
+        recent = profile.recent_penalties()
+
+    stats = profile.stats() if profile is not None else history_stats(history)
+
+    if np is not None and songs:
+        return feature_matrix(songs).recommend(history, stats, recent)
+
+    genre_freq, artist_freq, avg_duration = stats
+
+    scored = [(ai_score(s, history, genre_freq, artist_freq, avg_duration, recent), s)
+              for s in songs]
+    best_score = max(scored, key=lambda x: x[0])[0]
+
+    best_candidates = [s for sc, s in scored if sc == best_score]
+
+    return random.choice(best_candidates)
+
+
+def history_stats(history):
+    """
+    Genre/artist play counts and average duration of a history.
+    """
     genre_freq = {}
     artist_freq = {}
     durations = []
@@ -149,37 +287,561 @@ def recommend_ai(songs, history):
 
     avg_duration = sum(durations) / len(durations)
 
-    scored = [(ai_score(s, history, genre_freq, artist_freq, avg_duration), s) for s in songs]
-    best_score = max(scored, key=lambda x: x[0])[0]
+    return genre_freq, artist_freq, avg_duration
 
-    best_candidates = [s for sc, s in scored if sc == best_score]
 
-    return random.choice(best_candidates)
+
+# ------------------ VECTORIZED ENGINE (NUMPY) -----------------
+
+class FeatureMatrix:
+    """
+    Column arrays for the whole catalog: Genre and Artist as
+    integer codes, Duration as floats. Scores every song in one
+    NumPy pass using the same formulas as similarity() / ai_score().
+    """
+
+    def __init__(self, songs):
+        self.songs = songs
+        self.genre_codes = {}
+        self.artist_codes = {}
+
+        self.ids = np.array([s["MusicID"] for s in songs])
+        self.rows = {}  # MusicID -> row positions (IDs may repeat)
+        for r, s in enumerate(songs):
+            self.rows.setdefault(s["MusicID"], []).append(r)
+        self.genre = np.array(
+            [self.genre_codes.setdefault(s["Genre"], len(self.genre_codes)) for s in songs]
+        )
+        self.artist = np.array(
+            [self.artist_codes.setdefault(s["Artist"], len(self.artist_codes)) for s in songs]
+        )
+        self.duration = np.array([s["Duration"] for s in songs], dtype=np.float64)
+
+    def _match(self, codes, column, value):
+        code = codes.get(value)
+        if code is None:
+            return np.zeros(len(self.songs), dtype=bool)
+        return column == code
+
+    def similarity_scores(self, target_song):
+        """
+        similarity(target_song, s) for every song s.
+        """
+        score = np.where(self._match(self.genre_codes, self.genre, target_song["Genre"]), 0.5, 0.0)
+        score += np.where(self._match(self.artist_codes, self.artist, target_song["Artist"]), 0.3, 0.0)
+
+        diff = np.abs(self.duration - target_song["Duration"])
+        score += np.maximum(0, 0.2 - diff / 300)
+        return score
+
+    def ai_scores(self, history, genre_freq, artist_freq, avg_duration, recent=None):
+        """
+        ai_score(s, ...) for every song s.
+        """
+        # float64 holds the integer counts exactly; decayed counts are floats
+        genre_w = np.array([genre_freq.get(g, 0) for g in self.genre_codes], dtype=np.float64)
+        artist_w = np.array([artist_freq.get(a, 0) for a in self.artist_codes], dtype=np.float64)
+
+        # frequency part first, in the same order as the scalar version
+        score = 5 * genre_w[self.genre] + 3 * artist_w[self.artist]
+        score = score + np.maximum(0, 2 - np.abs(self.duration - avg_duration) / 50)
+
+        if recent is not None:
+            rows, penalties = [], []
+            for song_id, penalty in recent.items():
+                for r in self.rows.get(song_id, ()):
+                    rows.append(r)
+                    penalties.append(penalty)
+            if rows:
+                score[rows] -= penalties
+        elif history:
+            score[self.rows.get(history[-1]["id"], [])] -= 5
+
+        return score
+
+    def top_n(self, scores, top_n, candidates=None):
+        """
+        Indices of the top N scores, highest first; ties keep catalog
+        order (same as a stable sort). argpartition keeps this O(n).
+        """
+        if candidates is None:
+            candidates = np.arange(len(scores))
+        if top_n <= 0 or len(candidates) == 0:
+            return []
+
+        sub = scores[candidates]
+        if top_n < len(sub):
+            kth = -np.partition(-sub, top_n - 1)[top_n - 1]
+            keep = np.flatnonzero(sub >= kth)
+            candidates, sub = candidates[keep], sub[keep]
+
+        order = np.lexsort((candidates, -sub))[:top_n]
+        return candidates[order].tolist()
+
+    def similar(self, target_song, top_n=5):
+        scores = self.similarity_scores(target_song)
+        candidates = np.flatnonzero(self.ids != target_song["MusicID"])
+        return [self.songs[i] for i in self.top_n(scores, top_n, candidates)]
+
+    def recommend(self, history, stats=None, recent=None):
+        genre_freq, artist_freq, avg_duration = stats or history_stats(history)
+        scores = self.ai_scores(history, genre_freq, artist_freq, avg_duration, recent)
+
+        best = np.flatnonzero(scores == scores.max())
+        return random.choice([self.songs[i] for i in best])
+
+
+def feature_matrix(songs):
+    """
+    Cached FeatureMatrix for a catalog.
+    """
+    return catalog_cached("features", songs, FeatureMatrix)
+
+
+
+# ------------------ PRECOMPUTED SIMILAR-SONG INDEX ------------
+
+SIMILAR_INDEX_K = 10  # neighbours kept per song
+
+
+class SimilarityIndex:
+    """
+    Persistent top-K neighbour lists for every song, so a similar-song
+    lookup is a row read instead of a catalog scan.
+    Rows are ordered exactly like similar_songs() (score, then catalog
+    order) and kept current incrementally by sync(), which runs on a
+    background thread (see refresh()); lookups return None meanwhile
+    and the caller scans instead.
+    """
+
+    def __init__(self, path, k=SIMILAR_INDEX_K):
+        self.path = path
+        self.k = k
+        self.synced = None         # catalog key the index was last synced to
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.pending = None        # snapshot waiting for the worker
+        self.worker = None
+        self._set(*self._columns([]), np.full((0, k), -1, dtype=np.int64),
+                  np.full((0, k), -np.inf))
+
+    def _set(self, ids, genres, artists, durations, neighbors, scores):
+        rows = {mid: r for r, mid in enumerate(ids.tolist())}
+        with self.lock:
+            self.ids = ids
+            self.genres = genres
+            self.artists = artists
+            self.durations = durations
+            self.neighbors = neighbors  # MusicIDs, -1 = empty slot
+            self.scores = scores
+            self.rows = rows
+
+    @staticmethod
+    def _columns(songs):
+        return (
+            np.array([s["MusicID"] for s in songs], dtype=np.int64),
+            np.array([s["Genre"] for s in songs], dtype=str),
+            np.array([s["Artist"] for s in songs], dtype=str),
+            np.array([s["Duration"] for s in songs], dtype=np.float64),
+        )
+
+    # ---------------- PERSISTENCE ----------------
+
+    def load(self):
+        """
+        Read the index file. A missing or unreadable file leaves it empty.
+        """
+        try:
+            with np.load(self.path) as data:
+                if data["neighbors"].shape[1] != self.k:
+                    return
+                self._set(data["ids"], data["genres"], data["artists"],
+                          data["durations"], data["neighbors"], data["scores"])
+        except (OSError, KeyError, ValueError):
+            pass
+
+    def save(self):
+        buf = io.BytesIO()
+        np.savez(buf, ids=self.ids, genres=self.genres, artists=self.artists,
+                 durations=self.durations, neighbors=self.neighbors, scores=self.scores)
+        atomic_write(self.path, buf.getvalue())
+
+    # ---------------- BUILD / SYNC ----------------
+
+    def _fill_row(self, features, pos, neighbors, scores, song_scores=None):
+        song = features.songs[pos]
+        if song_scores is None:
+            song_scores = features.similarity_scores(song)
+
+        candidates = np.flatnonzero(features.ids != song["MusicID"])
+        top = features.top_n(song_scores, self.k, candidates)
+
+        neighbors[pos] = -1
+        scores[pos] = -np.inf
+        neighbors[pos, :len(top)] = features.ids[top]
+        scores[pos, :len(top)] = song_scores[top]
+
+    def build(self, songs):
+        """
+        Full rebuild: one vectorized scoring pass per song.
+        """
+        features = FeatureMatrix(songs)
+        n = len(songs)
+        neighbors = np.full((n, self.k), -1, dtype=np.int64)
+        scores = np.full((n, self.k), -np.inf)
+
+        for pos in range(n):
+            self._fill_row(features, pos, neighbors, scores)
+
+        self._set(*self._columns(songs), neighbors, scores)
+
+    def sync(self, songs):
+        """
+        Bring the index in line with the catalog.
+        Only rows touched by added, removed or edited songs are
+        recomputed. Returns True if the index changed.
+        """
+        ids, genres, artists, durations = self._columns(songs)
+
+        if (len(ids) == len(self.ids) and np.array_equal(ids, self.ids)
+                and np.array_equal(genres, self.genres) and np.array_equal(artists, self.artists)
+                and np.array_equal(durations, self.durations)):
+            return False
+
+        new_pos = {mid: p for p, mid in enumerate(ids.tolist())}
+
+        # old rows whose song is still there, unchanged
+        kept_old, kept_new = [], []
+        for r, mid in enumerate(self.ids.tolist()):
+            p = new_pos.get(mid)
+            if (p is not None and genres[p] == self.genres[r] and artists[p] == self.artists[r]
+                    and durations[p] == self.durations[r]):
+                kept_old.append(r)
+                kept_new.append(p)
+
+        gone = np.setdiff1d(self.ids, ids[kept_new])
+        fresh = np.setdiff1d(np.arange(len(ids)), kept_new)
+
+        # tie order depends on catalog order; a reshuffle needs a rebuild
+        reordered = any(a > b for a, b in zip(kept_new, kept_new[1:]))
+        if reordered or len(gone) + len(fresh) > len(ids) // 4:
+            self.build(songs)
+            return True
+
+        features = FeatureMatrix(songs)
+        neighbors = np.full((len(ids), self.k), -1, dtype=np.int64)
+        scores = np.full((len(ids), self.k), -np.inf)
+        neighbors[kept_new] = self.neighbors[kept_old]
+        scores[kept_new] = self.scores[kept_old]
+
+        # rows that lost a neighbour need the next-best one: recompute
+        kept_new = np.array(kept_new, dtype=np.int64)
+        dirty = kept_new[np.isin(neighbors[kept_new], gone).any(axis=1)]
+        for pos in dirty:
+            self._fill_row(features, pos, neighbors, scores)
+
+        # untouched rows may gain a new song as a neighbour
+        eligible = np.zeros(len(ids), dtype=bool)
+        eligible[kept_new] = True
+        eligible[dirty] = False
+
+        for pos in fresh:
+            song_scores = features.similarity_scores(songs[pos])
+            self._fill_row(features, pos, neighbors, scores, song_scores)
+
+            hit = eligible & (song_scores >= scores[:, -1]) & (ids != ids[pos])
+            for row in np.flatnonzero(hit):
+                self._insert(row, pos, ids[pos], song_scores[row], neighbors, scores, new_pos)
+
+        self._set(ids, genres, artists, durations, neighbors, scores)
+        return True
+
+    @staticmethod
+    def _insert(row, pos, mid, score, neighbors, scores, new_pos):
+        """
+        Insert one candidate into a sorted neighbour row, if it makes the cut.
+        """
+        for slot in range(neighbors.shape[1]):
+            other = neighbors[row, slot]
+            if other == -1 or score > scores[row, slot] or (
+                    score == scores[row, slot] and pos < new_pos[int(other)]):
+                neighbors[row, slot + 1:] = neighbors[row, slot:-1].copy()
+                scores[row, slot + 1:] = scores[row, slot:-1].copy()
+                neighbors[row, slot] = mid
+                scores[row, slot] = score
+                return
+
+    @staticmethod
+    def _catalog_key(songs):
+        return (id(songs), getattr(songs, "version", None), len(songs))
+
+    def update(self, songs):
+        """
+        Sync with a saved catalog and persist if anything changed.
+        """
+        if self.sync(songs):
+            self.save()
+
+    # ---------------- BACKGROUND SYNC ----------------
+
+    @staticmethod
+    def _snapshot(songs):
+        # the scored fields, copied so the worker never sees a catalog mid-edit
+        return [{"MusicID": s["MusicID"], "Genre": s["Genre"], "Artist": s["Artist"],
+                 "Duration": s["Duration"]} for s in songs]
+
+    def refresh(self, songs):
+        """
+        Sync with the catalog and persist on a background thread.
+        A newer call replaces a snapshot the worker has not started on.
+        """
+        with self.lock:
+            self.synced = self._catalog_key(songs)
+            self.pending = self._snapshot(songs)
+            self.ready.clear()
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._run, daemon=True)
+                self.worker.start()
+
+    def _run(self):
+        while True:
+            with self.lock:
+                songs, self.pending = self.pending, None
+                if songs is None:
+                    self.worker = None
+                    self.ready.set()
+                    return
+            try:
+                self.update(songs)
+            except Exception:
+                pass  # lookups keep falling back to a scan
+
+    def wait_until_ready(self, timeout=None):
+        """
+        Block until the background sync is done. False on timeout.
+        """
+        return self.ready.wait(timeout)
+
+    # ---------------- LOOKUP ----------------
+
+    def lookup(self, target_song, songs, top_n=5):
+        """
+        Precomputed similar_songs(). Returns None when the index cannot
+        answer (top_n above K, still syncing, or the song is not indexed).
+        """
+        if top_n > self.k:
+            return None
+
+        key = self._catalog_key(songs)
+        if key[1] is None:
+            # plain list: no version to tell edits by, sync every time
+            self.refresh(songs)
+            self.ready.wait()
+        elif key != self.synced:
+            self.refresh(songs)
+
+        if not self.ready.is_set():
+            return None  # still syncing in the background
+
+        with self.lock:
+            row = self.rows.get(target_song["MusicID"])
+            if row is None or target_song["Genre"] != self.genres[row] \
+                    or target_song["Artist"] != self.artists[row] \
+                    or target_song["Duration"] != self.durations[row]:
+                return None
+            neighbors = self.neighbors[row, :top_n].tolist()
+
+        found = (find_song(songs, mid) for mid in neighbors if mid != -1)
+        return [s for s in found if s]
+
+
+def open_similarity_index(songs, path, k=SIMILAR_INDEX_K):
+    """
+    Load the index from disk and bring it up to date with the catalog
+    in the background; similar_songs() scans until it is ready.
+    Returns None when NumPy is unavailable.
+    """
+    if np is None:
+        return None
+
+    index = SimilarityIndex(path, k)
+    index.load()
+    index.refresh(songs)
+    return index
+
+
+
+# ------------------ BATCH RECOMMENDATIONS ---------------------
+
+BATCH_CELLS = 1_000_000   # user x song scores held at once per worker (~8 MB)
+BATCH_POOL_MIN = 2000     # fewer users than this are scored in-process
+
+_batch_columns = None  # catalog columns inside a pool worker
+
+
+def _init_batch(columns):
+    global _batch_columns
+    _batch_columns = columns
+
+
+def _score_users(job):
+    """
+    Top-N catalog positions for a block of users: one (users x songs)
+    score matrix, same formula and tie order as FeatureMatrix.
+    """
+    genre, artist, duration = _batch_columns
+    genre_w, artist_w, avg, penalties, top_n = job
+
+    scores = 5 * genre_w[:, genre] + 3 * artist_w[:, artist]
+    scores += np.maximum(0, 2 - np.abs(duration[None, :] - avg[:, None]) / 50)
+    for row, user_penalties in enumerate(penalties):
+        for positions, penalty in user_penalties:
+            scores[row, positions] -= penalty
+
+    n = scores.shape[1]
+    k = min(top_n, n)
+    kth = -np.partition(-scores, k - 1, axis=1)[:, k - 1]
+
+    results = []
+    for row in range(len(scores)):
+        candidates = np.flatnonzero(scores[row] >= kth[row])
+        order = np.lexsort((candidates, -scores[row, candidates]))[:k]
+        results.append(candidates[order].tolist())
+    return results
+
+
+def batch_recommend(songs, histories, top_n=20, workers=None):
+    """
+    Top-N AI picks for many users at once: {username: [song, ...]}.
+    Scores are the same as recommend_ai() (including the recency mode),
+    but each block of users is one matrix operation, and large user
+    counts are spread over a process pool. Users with fewer than 5
+    plays are skipped, like recommend_ai().
+    """
+    users = [u for u, h in histories.items() if len(h) >= 5]
+    if not users or not songs:
+        return {}
+
+    if np is None:
+        return {u: _recommend_top_scalar(songs, histories[u], top_n) for u in users}
+
+    fm = feature_matrix(songs)
+    positions = {}
+    for pos, song_id in enumerate(fm.ids.tolist()):
+        positions.setdefault(song_id, []).append(pos)
+
+    # per-user weights as dense rows over the catalog's genre/artist codes
+    now = time.time()
+    genre_w = np.zeros((len(users), len(fm.genre_codes)))
+    artist_w = np.zeros((len(users), len(fm.artist_codes)))
+    avg = np.zeros(len(users))
+    penalties = []  # per user: [(catalog positions, penalty), ...]
+
+    for row, user in enumerate(users):
+        history = histories[user]
+        if AI_SCORING == "recency":
+            profile = TasteProfile.from_history(history)
+            genre_freq, artist_freq, avg[row] = profile.stats(now)
+            recent = profile.recent_penalties()
+        else:
+            genre_freq, artist_freq, avg[row] = history_stats(history)
+            recent = {history[-1]["id"]: 5}
+
+        for g, v in genre_freq.items():
+            if g in fm.genre_codes:
+                genre_w[row, fm.genre_codes[g]] = v
+        for a, v in artist_freq.items():
+            if a in fm.artist_codes:
+                artist_w[row, fm.artist_codes[a]] = v
+
+        penalties.append([(positions[i], p) for i, p in recent.items() if i in positions])
+
+    block = max(1, BATCH_CELLS // len(songs))
+    jobs = []
+    for start in range(0, len(users), block):
+        stop = start + block
+        jobs.append((
+            genre_w[start:stop], artist_w[start:stop], avg[start:stop],
+            penalties[start:stop],
+            top_n,
+        ))
+
+    columns = (fm.genre, fm.artist, fm.duration)
+    if workers == 1 or len(users) < BATCH_POOL_MIN:
+        _init_batch(columns)
+        blocks = map(_score_users, jobs)
+    else:
+        pool = ProcessPoolExecutor(workers, initializer=_init_batch, initargs=(columns,))
+        with pool:
+            blocks = list(pool.map(_score_users, jobs))
+
+    picks = [row for result in blocks for row in result]
+    return {u: [songs[p] for p in rows] for u, rows in zip(users, picks)}
+
+
+def _recommend_top_scalar(songs, history, top_n):
+    profile = TasteProfile.from_history(history)
+    recent = profile.recent_penalties() if AI_SCORING == "recency" else None
+    genre_freq, artist_freq, avg_duration = profile.stats()
+
+    scored = [(ai_score(s, history, genre_freq, artist_freq, avg_duration, recent), -pos)
+              for pos, s in enumerate(songs)]
+    return [songs[-pos] for _, pos in heapq.nlargest(top_n, scored)]
 
 
 
 # ------------------ AUTO NEXT SONG PREDICTOR ------------------
 
-def predict_next(songs, history):
+COLLAB_PICKS = 3  # "listeners also played" songs added to the mix
+COLLAB_BLEND = 0.25  # share of Markov-path picks drawn from those instead
+
+
+def predict_next(songs, history, index=None, profile=None, collab=None, markov=None):
     """
     Predict the next song based on last played.
-    Combines similarity + AI.
+    With a TransitionModel that knows the last song(s), draws from
+    what listeners actually played next, blended with what other
+    listeners played around the same song when a CoOccurrence model
+    is given. Otherwise (cold start) combines similarity + AI, plus
+    those co-played songs.
     """
     if not history:
         return random.choice(songs)
 
     last = history[-1]
-    last_song = next((s for s in songs if s["MusicID"] == last["id"]), None)
+    also = []
+    if collab is not None:
+        also = [
+            (find_song(songs, song_id), score)
+            for song_id, score in collab.also_played(last["id"], COLLAB_PICKS)
+        ]
+        also = [(s, score) for s, score in also if s]
+
+    if markov is not None:
+        song_id = markov.sample(history)
+        pick = find_song(songs, song_id) if song_id is not None else None
+        if pick:
+            total = sum(score for _, score in also)
+            if not total:
+                return pick
+            # the Markov pick keeps 1 - COLLAB_BLEND of the draw; the
+            # co-played songs split the rest by their cosine score
+            weights = [1 - COLLAB_BLEND] + [COLLAB_BLEND * score / total for _, score in also]
+            return random.choices([pick] + [s for s, _ in also], weights)[0]
+
+    last_song = find_song(songs, last["id"])
 
     if not last_song:
         return random.choice(songs)
 
     # Mix: 60% similar songs, 40% AI recommendation
-    similar = similar_songs(last_song, songs)
-    ai_result = recommend_ai(songs, history)
+    similar = similar_songs(last_song, songs, index=index)
+    ai_result = recommend_ai(songs, history, profile)
 
     combined = similar + ([ai_result] if ai_result else [])
 
+    combined += [s for s, _ in also]
+
     combined = [c for c in combined if c]  # remove None
 
     return random.choice(combined) if combined else random.choice(songs)
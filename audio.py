@@ -1,7 +1,15 @@
 import os
+import json
 import time
+import queue
+import atexit
+import threading
+from collections import OrderedDict, deque
 import pygame # type: ignore
-from ui import clear, waveform, ascii_cover, show_cover, display_waveform
+from ui import ascii_cover, poll_line, box, ScreenRenderer
+from database import DATA_DIR, atomic_write
+from visualizer import VISUALIZER
+from mp3info import track_duration
 
 
 # --------------------------------------------------------------
@@ -9,6 +17,10 @@ from ui import clear, waveform, ascii_cover, show_cover, display_waveform
 # --------------------------------------------------------------
 
 MP3_DIR = "mp3"
+MP3_INDEX_FILE = os.path.join(DATA_DIR, "mp3_index.json")
+
+# memory budget for decoded tracks kept in AUDIO_CACHE
+AUDIO_CACHE_MB = int(os.environ.get("MUSIT_AUDIO_CACHE_MB", "256"))
 
 
 # ---------------------- INITIALIZE MIXER ----------------------
@@ -16,83 +28,621 @@ MP3_DIR = "mp3"
 pygame.mixer.init()
 
 
-# ---------------------- LOAD MP3 FILE -------------------------
+# ---------------------- DECODED AUDIO CACHE -------------------
 
-def load_mp3(filename):
+class AudioCache:
     """
-    Loads and prepares an MP3 file for playback.
+    LRU cache of decoded tracks (pygame.mixer.Sound), bounded by a
+    byte budget, so replays skip the MP3 decode. Misses are decoded
+    on a background worker (see fill), never on the caller's thread.
+    """
+
+    def __init__(self, budget_mb=AUDIO_CACHE_MB):
+        self.budget = budget_mb * 1024 * 1024
+        self.used = 0
+        self.sounds = OrderedDict()  # path -> (Sound, bytes)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.fills = queue.Queue()  # (path, on_ready) to decode in the background
+        self.filler = None
+
+    @staticmethod
+    def sound_bytes(sound):
+        """
+        Decoded PCM size: seconds * rate * channels * sample bytes.
+        """
+        freq, size, channels = pygame.mixer.get_init()
+        return int(sound.get_length() * freq * channels * abs(size) // 8)
+
+    @staticmethod
+    def decode(path):
+        """
+        Decode a file to a Sound, or None if this pygame build can't.
+        """
+        try:
+            return pygame.mixer.Sound(path)
+        except (pygame.error, OSError):
+            return None
+
+    def get(self, path):
+        """
+        Decoded Sound for path, or None on a miss. Counts hits/misses;
+        the caller streams a miss and may fill() it for next time.
+        """
+        with self.lock:
+            if path in self.sounds:
+                self.sounds.move_to_end(path)
+                self.hits += 1
+                return self.sounds[path][0]
+            self.misses += 1
+        return None
+
+    def peek(self, path):
+        """
+        Decoded Sound if cached, else None. No counting, no decode.
+        """
+        with self.lock:
+            entry = self.sounds.get(path)
+            return entry[0] if entry is not None else None
+
+    def fill(self, path, on_ready=None):
+        """
+        Decode a track into the cache on the fill worker, then call
+        on_ready(sound) (sound is None if it can't be decoded).
+        """
+        self.fills.put((path, on_ready))
+        with self.lock:
+            if self.filler is None or not self.filler.is_alive():
+                self.filler = threading.Thread(target=self._fill_loop, daemon=True)
+                self.filler.start()
+
+    def _fill_loop(self):
+        while True:
+            path, on_ready = self.fills.get()
+            sound = self.preload(path)
+            if on_ready is not None:
+                on_ready(sound)
+
+    def preload(self, path):
+        """
+        Decode a track ahead of time without touching hit/miss counts.
+        """
+        with self.lock:
+            if path in self.sounds:
+                return self.sounds[path][0]
+        return self._add(path)
+
+    def _add(self, path):
+        sound = self.decode(path)
+        if sound is None:
+            return None
+
+        size = self.sound_bytes(sound)
+        if size > self.budget:
+            return sound  # too big to keep, play it uncached
+
+        with self.lock:
+            if path not in self.sounds:
+                self.sounds[path] = (sound, size)
+                self.used += size
+            self.sounds.move_to_end(path)
+
+            while self.used > self.budget:
+                _, (_, old_size) = self.sounds.popitem(last=False)
+                self.used -= old_size
+                self.evictions += 1
+
+        return sound
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "tracks": len(self.sounds),
+                "used_mb": self.used / (1024 * 1024),
+                "budget_mb": self.budget / (1024 * 1024),
+            }
+
+
+AUDIO_CACHE = AudioCache()
+
+
+def audio_cache_stats():
+    return AUDIO_CACHE.stats()
+
+
+# ---------------------- NEXT-TRACK PREFETCHER -----------------
+
+class Prefetcher:
+    """
+    Worker thread that decodes the likely next track while the
+    current one plays and queues it on the engine, so the switch
+    is gapless and starts from audio that is already decoded.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.jobs = queue.Queue()
+        self.thread = None
+
+    def submit(self, job):
+        """
+        job() -> filename of the track to play next, or None.
+        Replaces any job that has not started yet.
+        """
+        while not self.jobs.empty():
+            try:
+                self.jobs.get_nowait()
+            except queue.Empty:
+                break
+
+        self.jobs.put(job)
+
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                filename = job()
+            except Exception:
+                filename = None  # prediction is best-effort
+
+            if filename and self.jobs.empty():
+                path = os.path.join(MP3_DIR, filename)
+                VISUALIZER.prepare(path, self.cache.preload(path))
+
+            if self.jobs.empty():  # else a newer song started, its job wins
+                ENGINE.up_next(filename)
+
+
+PREFETCHER = Prefetcher(AUDIO_CACHE)
+
+
+def prefetch(job):
+    """
+    Pick, decode and queue the next track in the background (see Prefetcher).
+    """
+    PREFETCHER.submit(job)
+
+
+# ---------------------- PLAYBACK ENGINE -----------------------
+
+ENGINE_TICK = 0.15  # seconds between progress events
+FALLBACK_DURATION = 180
+
+
+class PlaybackEngine:
+    """
+    Runs playback on a background thread so menus stay responsive.
+    Callers send commands (play, pause, resume, seek, stop, next,
+    enqueue, up_next, volume) through a queue; state changes come back as
+    events to subscribed callbacks: callback(event, state).
+
+    Events: started, progress, paused, resumed, ended, stopped,
+    idle (nothing left to play) and error.
     """
-    path = os.path.join(MP3_DIR, filename)
-    if not os.path.exists(path):
-        print(f"[ERROR] MP3 file not found: {path}")
-        return False
 
-    pygame.mixer.music.load(path)
-    return True
+    def __init__(self, cache):
+        self.cache = cache
+        self.commands = queue.Queue()
+        self.listeners = []
+        self.upcoming = deque()  # (filename, duration) waiting to play
+        self.sound = None        # cached Sound playing now; None when streaming
+        self.channel = None
+        self.queued = None       # (filename, duration, Sound) queued on the channel
+        self.started_at = 0.0
+        self.paused_at = None
+        self.state = {
+            "status": "stopped", "file": None,
+            "duration": 0, "elapsed": 0.0, "volume": 0.7,
+            "advanced": False,  # True when the track came off the queue
+        }
+        self.lock = threading.Lock()
+        self.thread = None
+
+    # ---------------- COMMANDS (any thread) ----------------
+
+    def send(self, command, *args):
+        self.commands.put((command, args))
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def play(self, filename, duration=None, volume=None):
+        self.send("play", filename, duration, volume)
+
+    def pause(self):
+        self.send("pause")
+
+    def resume(self):
+        self.send("resume")
+
+    def stop(self):
+        self.send("stop")
+
+    def next(self):
+        self.send("next")
+
+    def seek(self, position):
+        """Jump to an absolute position in seconds."""
+        self.send("seek", position)
+
+    def enqueue(self, filename, duration=None):
+        """Play this after the current track (gapless when decoded)."""
+        self.send("enqueue", filename, duration)
+
+    def up_next(self, filename, duration=None):
+        """Make this the only track waiting (None: nothing waits)."""
+        self.send("up_next", filename, duration)
+
+    def set_volume(self, level):
+        self.send("volume", level)
+
+    # ---------------- EVENTS ----------------
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.state)
+
+    def _update(self, **changes):
+        with self.lock:
+            self.state.update(changes)
+
+    def _emit(self, event):
+        state = self.snapshot()
+        for callback in list(self.listeners):
+            try:
+                callback(event, state)
+            except Exception:
+                pass  # a broken listener must not stop playback
+
+    # ---------------- ENGINE THREAD ----------------
+
+    def _run(self):
+        while True:
+            try:
+                command, args = self.commands.get(timeout=ENGINE_TICK)
+                getattr(self, "_do_" + command)(*args)
+            except queue.Empty:
+                pass
+            except pygame.error:
+                self._halt()
+                self._update(status="stopped", elapsed=0.0)
+                self._emit("error")
+            self._tick()
+
+    def _halt(self):
+        pygame.mixer.stop()
+        pygame.mixer.music.stop()
+        self.sound = None
+        self.channel = None
+        self.queued = None
+        self.paused_at = None
+
+    def _start(self, filename, duration, sound=None, advanced=False):
+        """Bookkeeping for a track that just started playing."""
+        # the file's real length beats the hand-entered catalog value
+        duration = track_duration(os.path.join(MP3_DIR, filename)) or duration
+        if duration is None:
+            duration = sound.get_length() if sound is not None else FALLBACK_DURATION
+        self.started_at = time.time()
+        self.paused_at = None
+        self._update(status="playing", file=filename, duration=duration,
+                     elapsed=0.0, advanced=advanced)
+        self._emit("started")
+
+    def _do_play(self, filename, duration=None, volume=None, advanced=False):
+        path = os.path.join(MP3_DIR, filename)
+        if not os.path.exists(path):
+            self._update(status="stopped", file=None)
+            self._emit("error")
+            return
+
+        self._halt()
+        if volume is not None:
+            self._update(volume=volume)
+        volume = self.snapshot()["volume"]
+
+        self.sound = self.cache.get(path)
+        if self.sound is not None:
+            VISUALIZER.prepare(path, self.sound)
+            self.sound.set_volume(volume)
+            self.channel = self.sound.play()
+        else:
+            # not decoded yet: stream it now, decode for next time meanwhile
+            self.cache.fill(path, lambda sound: VISUALIZER.prepare(path, sound))
+            pygame.mixer.music.load(path)
+            pygame.mixer.music.set_volume(volume)
+            pygame.mixer.music.play()
+
+        self._start(filename, duration, self.sound, advanced)
+
+    def _do_pause(self):
+        if self.state["status"] != "playing":
+            return
+        pygame.mixer.pause()
+        pygame.mixer.music.pause()
+        self.paused_at = time.time()
+        self._update(status="paused")
+        self._emit("paused")
+
+    def _do_resume(self):
+        if self.state["status"] != "paused":
+            return
+        pygame.mixer.unpause()
+        pygame.mixer.music.unpause()
+        self.started_at += time.time() - self.paused_at
+        self.paused_at = None
+        self._update(status="playing")
+        self._emit("resumed")
+
+    def _do_stop(self):
+        self._halt()
+        self.upcoming.clear()
+        self._update(status="stopped", elapsed=0.0)
+        self._emit("stopped")
+        self._emit("idle")
+
+    def _do_next(self):
+        if self.queued is None and not self.upcoming:
+            return  # nothing to skip to: keep playing
+        if self.queued is not None:
+            self.upcoming.appendleft(self.queued[:2])
+        self._advance()
+
+    def _do_seek(self, position):
+        state = self.snapshot()
+        if state["file"] is None or state["status"] == "stopped":
+            return
+
+        position = max(0.0, min(position, state["duration"]))
+        queued = self.queued
+
+        # Sounds can't seek: continue the same file streamed from disk
+        self._halt()
+        if queued is not None:
+            self.upcoming.appendleft(queued[:2])
+        pygame.mixer.music.load(os.path.join(MP3_DIR, state["file"]))
+        pygame.mixer.music.set_volume(state["volume"])
+        pygame.mixer.music.play(start=position)
+
+        self.started_at = time.time() - position
+        self._update(status="playing", elapsed=position)
+        self._emit("progress")
+
+    def _do_enqueue(self, filename, duration=None):
+        self.upcoming.append((filename, duration))
+
+    def _do_up_next(self, filename, duration=None):
+        self.upcoming.clear()
+        if self.queued is not None and self.queued[0] == filename:
+            return  # already handed to the channel
+        if filename is not None:
+            self.upcoming.append((filename, duration))
+
+    def _do_volume(self, level):
+        self._update(volume=level)
+        pygame.mixer.music.set_volume(level)
+        if self.sound is not None:
+            self.sound.set_volume(level)
+        if self.queued is not None:
+            self.queued[2].set_volume(level)
+
+    def _advance(self):
+        """Start the next queued track, or go idle."""
+        if self.upcoming:
+            self._do_play(*self.upcoming.popleft(), advanced=True)
+        else:
+            self._halt()
+            self._update(status="stopped", elapsed=0.0)
+            self._emit("idle")
+
+    def _tick(self):
+        if self.state["status"] != "playing":
+            return
+
+        # hand the next decoded track to the channel for a gapless switch
+        if self.channel is not None and self.queued is None and self.upcoming:
+            filename, duration = self.upcoming[0]
+            nxt = self.cache.peek(os.path.join(MP3_DIR, filename))
+            if nxt is not None:
+                self.upcoming.popleft()
+                nxt.set_volume(self.state["volume"])
+                self.channel.queue(nxt)
+                self.queued = (filename, duration, nxt)
+
+        if self.queued is not None and self.channel.get_sound() is self.queued[2]:
+            self._emit("ended")
+            filename, duration, self.sound = self.queued
+            self.queued = None
+            self._start(filename, duration, self.sound, advanced=True)
+            return
+
+        busy = self.channel.get_busy() if self.channel is not None else pygame.mixer.music.get_busy()
+        if not busy:
+            self._emit("ended")
+            self._advance()
+            return
+
+        self._update(elapsed=time.time() - self.started_at)
+        self._emit("progress")
+
+
+ENGINE = PlaybackEngine(AUDIO_CACHE)
+
+
+def is_playing():
+    return ENGINE.snapshot()["status"] != "stopped"
+
+
+def on_advance(callback):
+    """
+    callback(filename) whenever the engine moves on to a queued track
+    by itself (gapless switch or [n]), so the caller can log the play.
+    """
+    def listener(event, state):
+        if event == "started" and state["advanced"]:
+            callback(state["file"])
+
+    ENGINE.subscribe(listener)
 
 
 # ---------------------- PLAY SONG -----------------------------
 
+PLAYBACK_KEYS = "[Enter] menu  [p] pause/resume  [n] next  [s] stop  [<]/[>] seek 10s"
+
+
 def play_audio(filename, duration=None, volume=0.7, cover_path=None):
     """
     Plays an MP3 file with visual waveform.
-    duration: optional override for progress bar (in seconds)
+    duration: progress bar length (in seconds) if the file
+              header can't be probed
+    Returns to the caller on Enter while the music keeps playing.
     """
-
-    if not load_mp3(filename):
+    path = os.path.join(MP3_DIR, filename)
+    if not os.path.exists(path):
+        print(f"[ERROR] MP3 file not found: {path}")
         return
 
-    pygame.mixer.music.set_volume(volume)
-    pygame.mixer.music.play()
-
-    clear()
-    print(ascii_cover(cover_path) if cover_path else ascii_cover())
+    ENGINE.play(filename, duration, volume)
+    now_playing(cover_path, starting=True)
 
-    # If duration not provided, try reading from pygame (not very accurate)
-    if duration is None:
-        duration = 180  # fallback default
 
-    print(f"\nPlaying: {filename}")
-    print(f"Duration: {duration} sec")
-    print("Press CTRL+C to stop.\n")
+def now_playing(cover_path=None, starting=False):
+    """
+    Playback screen driven by engine events.
+    Leaves when playback goes idle or the user presses Enter.
+    starting: a play command was just sent; wait for its events
+    """
+    events = queue.Queue()
 
-    start = time.time()
+    def listener(event, state):
+        events.put((event, state))
 
-    try:
-        while pygame.mixer.music.get_busy():
-            elapsed = time.time() - start
-            progress = min(elapsed / duration, 1)
+    ENGINE.subscribe(listener)
 
-            # Progress Bar
-            bar_len = 40
-            filled = int(bar_len * progress)
-            bar = "█" * filled + "-" * (bar_len - filled)
+    state = ENGINE.snapshot()
+    if state["status"] == "stopped" and not starting:
+        ENGINE.unsubscribe(listener)
+        box("Nothing is playing.")
+        return
 
-            clear()
-            print(ascii_cover(cover_path) if cover_path else ascii_cover())
-            print(f"\n[{bar}] {int(progress*100)}%  {int(elapsed)}s / {duration}s\n")
+    # static region: read the cover once per screen, not per frame
+    cover = (ascii_cover(cover_path) if cover_path else ascii_cover()).splitlines()
 
-            # Waveform animation
-            print(waveform(10, 30))
+    screen = ScreenRenderer()
+    screen.start()
 
-            time.sleep(0.15)
+    try:
+        # draw the current state now; events only arrive on changes
+        if not starting:
+            screen.render(playback_lines(cover, state), force=True)
+
+        while True:
+            try:
+                event, state = events.get(timeout=screen.interval)
+            except queue.Empty:
+                event = None
+
+            if event in ("idle", "error"):
+                return
+
+            if event is not None and event != "ended":
+                # state changes draw at once; progress ticks at the frame rate
+                screen.render(playback_lines(cover, state), force=event != "progress")
+
+            command = poll_line(0)
+            if command is None:
+                continue
+            if command == "":
+                return
+            playback_command(command)
 
     except KeyboardInterrupt:
         stop_audio()
 
+    finally:
+        ENGINE.unsubscribe(listener)
+
+
+def playback_lines(cover, state):
+    """
+    Playback screen as a list of lines. Only the progress bar and
+    spectrum change between frames.
+    """
+    duration = state["duration"] or FALLBACK_DURATION
+    elapsed = state["elapsed"]
+    progress = min(elapsed / duration, 1)
+
+    # Progress Bar
+    bar_len = 40
+    filled = int(bar_len * progress)
+    bar = "█" * filled + "-" * (bar_len - filled)
+
+    status = "  (paused)" if state["status"] == "paused" else ""
+
+    return cover + [
+        "",
+        f"Playing: {state['file']}{status}",
+        "",
+        f"[{bar}] {int(progress*100)}%  {int(elapsed)}s / {int(duration)}s",
+        "",
+        VISUALIZER.line(os.path.join(MP3_DIR, state["file"]), elapsed),
+        "",
+        PLAYBACK_KEYS,
+    ]
+
+
+def playback_command(command):
+    """
+    Single-key playback controls typed on the playback screen.
+    """
+    command = command.strip().lower()
+    state = ENGINE.snapshot()
+
+    if command == "p":
+        if state["status"] == "paused":
+            resume_audio()
+        else:
+            pause_audio()
+    elif command == "s":
+        stop_audio()
+    elif command == "n":
+        ENGINE.next()
+    elif command == ">":
+        ENGINE.seek(state["elapsed"] + 10)
+    elif command == "<":
+        ENGINE.seek(state["elapsed"] - 10)
+
 
 # ---------------------- PAUSE / RESUME / STOP ----------------
 
 def pause_audio():
-    pygame.mixer.music.pause()
+    ENGINE.pause()
 
 
 def resume_audio():
-    pygame.mixer.music.unpause()
+    ENGINE.resume()
 
 
 def stop_audio():
-    pygame.mixer.music.stop()
+    ENGINE.stop()
 
 
 # ---------------------- VOLUME CONTROL ------------------------
@@ -101,7 +651,131 @@ def set_volume(level):
     """
     level: 0.0 to 1.0
     """
-    pygame.mixer.music.set_volume(level)
+    ENGINE.set_volume(level)
+
+
+# ---------------------- MP3 LIBRARY INDEX ---------------------
+
+def normalize_name(text):
+    return text.lower().replace(" ", "")
+
+
+class Mp3Library:
+    """
+    Persistent index of the MP3 folder.
+    The folder is only re-listed when its mtime changes, and each
+    title's match is remembered until a change could affect it.
+    """
+
+    def __init__(self, folder=MP3_DIR, path=MP3_INDEX_FILE):
+        self.folder = folder
+        self.path = path
+        self.dir_mtime = None
+        self.files = []      # listing order, like os.listdir
+        self.resolved = {}   # normalized title -> filename or None
+        self.loaded = False
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    # ---------------- PERSISTENCE ----------------
+
+    def _load(self):
+        self.loaded = True
+        try:
+            with open(self.path, "r", encoding="utf8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get("folder") != self.folder:
+            return
+
+        self.dir_mtime = data["dir_mtime"]
+        self.files = data["files"]
+        self.resolved = data["resolved"]
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            atomic_write(self.path, json.dumps({
+                "folder": self.folder,
+                "dir_mtime": self.dir_mtime,
+                "files": self.files,
+                "resolved": self.resolved,
+            }, separators=(",", ":")))
+            self.dirty = False
+
+    # ---------------- REFRESH ----------------
+
+    def _refresh(self):
+        """
+        Re-list the folder if it changed since the last look.
+        """
+        if not self.loaded:
+            self._load()
+
+        try:
+            mtime = os.stat(self.folder).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        if mtime == self.dir_mtime and (mtime is not None or not self.files):
+            return
+
+        listing = []
+        if mtime is not None:
+            listing = [f for f in os.listdir(self.folder) if f.lower().endswith(".mp3")]
+
+        old = set(self.files)
+        removed = old.difference(listing)
+        added = [normalize_name(f) for f in listing if f not in old]
+
+        # forget answers the change could affect
+        for key, found in list(self.resolved.items()):
+            if found in removed or any(key in name for name in added):
+                del self.resolved[key]
+
+        self.files = listing
+        self.dir_mtime = mtime
+        self.dirty = True
+
+    # ---------------- LOOKUP ----------------
+
+    def _match(self, key):
+        if key in self.resolved:
+            return self.resolved[key]
+
+        # first filename containing the title, in listing order
+        found = next((f for f in self.files if key in normalize_name(f)), None)
+
+        self.resolved[key] = found
+        self.dirty = True
+        return found
+
+    def match(self, song_title):
+        with self.lock:
+            self._refresh()
+            return self._match(normalize_name(song_title))
+
+    def match_many(self, titles):
+        """
+        Resolve many titles (e.g. a whole playlist) with one refresh.
+        """
+        with self.lock:
+            self._refresh()
+            result = {t: self._match(normalize_name(t)) for t in titles}
+        self.save()
+        return result
+
+    def listing(self):
+        with self.lock:
+            self._refresh()
+            return list(self.files)
+
+
+MP3_LIBRARY = Mp3Library()
+atexit.register(MP3_LIBRARY.save)
 
 
 # ---------------------- SCAN MP3 DIRECTORY --------------------
@@ -110,10 +784,7 @@ def available_mp3():
     """
     Returns list of MP3 files in /mp3/.
     """
-    if not os.path.exists(MP3_DIR):
-        return []
-
-    return [f for f in os.listdir(MP3_DIR) if f.lower().endswith(".mp3")]
+    return MP3_LIBRARY.listing()
 
 
 # ---------------------- MATCH MP3 TO SONG TITLE ---------------
@@ -122,11 +793,43 @@ def match_mp3(song_title):
     """
     Best-effort match: try to find an MP3 file with similar name.
     """
-    files = available_mp3()
-    low_title = song_title.lower().replace(" ", "")
+    return MP3_LIBRARY.match(song_title)
+
 
-    for f in files:
-        if low_title in f.lower().replace(" ", ""):
-            return f
+def match_mp3_bulk(song_titles):
+    """
+    {title: filename or None} for a batch of titles.
+    """
+    return MP3_LIBRARY.match_many(song_titles)
 
-    return None
+
+# ---------------------- MP3 FOR A CATALOG SONG ----------------
+
+def song_mp3(song):
+    """
+    MP3 for a catalog song: the file ingest recorded for it ("File",
+    relative to MP3_DIR, may be in a subfolder) if it is still there,
+    else the best title match.
+    """
+    rel = song.get("File")
+    if rel and os.path.isfile(os.path.join(MP3_DIR, rel)):
+        return rel
+    return match_mp3(song["Title"])
+
+
+def song_mp3_bulk(songs):
+    """
+    {MusicID: filename or None} for a batch of songs (see song_mp3).
+    """
+    result, missing = {}, []
+    for song in songs:
+        rel = song.get("File")
+        if rel and os.path.isfile(os.path.join(MP3_DIR, rel)):
+            result[song["MusicID"]] = rel
+        else:
+            missing.append(song)
+
+    files = match_mp3_bulk([s["Title"] for s in missing])
+    for song in missing:
+        result[song["MusicID"]] = files[song["Title"]]
+    return result
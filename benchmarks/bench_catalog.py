@@ -0,0 +1,96 @@
+import gc
+import os
+import sys
+import json
+import time
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai import recommend_by_mood  # noqa: E402
+from catalog import Catalog, ColumnarCatalog  # noqa: E402
+from utils import sort_songs_by_artist, sort_songs_by_duration, sort_songs_by_title  # noqa: E402
+
+
+# -------------------------------------------------------------
+# MUSIT 5.0 — CATALOG LAYOUT BENCHMARK
+# -------------------------------------------------------------
+#
+#   python benchmarks/bench_catalog.py [catalog sizes...]
+#
+# Memory per song, build time, sorts and the mood filter for a
+# plain list of dicts, Catalog (dicts + indexes) and
+# ColumnarCatalog (MUSIT_CATALOG=columnar).
+
+SIZES = [10_000, 100_000, 1_000_000]
+GENRES = ["Pop", "Rock", "Jazz", "Hip-Hop", "Classical", "Electronic", "R&B", "Indie",
+          "Lo-Fi", "Metal", "Ambient", "Country"]
+
+
+def songs_json(rng, n):
+    return json.dumps([
+        {"MusicID": i + 1, "Title": f"Track {rng.randrange(10**9)}",
+         "Artist": f"Artist {rng.randrange(n // 10 + 1)}",
+         "Genre": rng.choice(GENRES), "Duration": rng.randint(90, 420)}
+        for i in range(n)
+    ])
+
+
+def traced(build):
+    """(object, bytes allocated by build() that are still alive)"""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+def best_ms(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main(sizes):
+    rng = random.Random(25)
+    for n in sizes:
+        text = songs_json(rng, n)
+        plain, m_plain = traced(lambda text=text: json.loads(text))
+        indexed, m_indexed = traced(lambda text=text: Catalog(json.loads(text)))
+        columnar, m_columnar = traced(lambda text=text: ColumnarCatalog(json.loads(text)))
+        m_index = m_indexed - m_plain  # both catalogs build the same indexes
+
+        print(f"n={n}: memory  dict list {m_plain / n:.0f} B/song | "
+              f"Catalog {m_indexed / n:.0f} B/song (indexes {m_index / n:.0f}) | "
+              f"Columnar {m_columnar / n:.0f} B/song (data {(m_columnar - m_index) / n:.0f})")
+        print(f"   build    Catalog {best_ms(lambda plain=plain: Catalog(plain)):.0f} ms  "
+              f"Columnar {best_ms(lambda plain=plain: ColumnarCatalog(plain)):.0f} ms")
+
+        for name, fn in (
+            ("sort title", sort_songs_by_title),
+            ("sort artist", sort_songs_by_artist),
+            ("sort duration", sort_songs_by_duration),
+            ("mood filter", lambda s: recommend_by_mood("chill", s)),
+        ):
+            def cold(fn=fn, columnar=columnar):
+                columnar.version += 1  # drop the cached sort order
+                fn(columnar)
+
+            print(f"   {name:13} dict list {best_ms(lambda fn=fn, s=plain: fn(s)):7.1f} ms  "
+                  f"Catalog {best_ms(lambda fn=fn, s=indexed: fn(s)):7.1f} ms  "
+                  f"Columnar {best_ms(cold):7.1f} ms  "
+                  f"(repeat {best_ms(lambda fn=fn, s=columnar: fn(s)):6.1f} ms)")
+
+        print(f"   iterate+Title dict list {best_ms(lambda s=plain: [r['Title'] for r in s]):7.1f} ms  "
+              f"Columnar {best_ms(lambda s=columnar: [r['Title'] for r in s]):7.1f} ms")
+        del plain, indexed, columnar
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DATA_FORMATS, load_json, save_json  # noqa: E402
+
+
+# -------------------------------------------------------------
+# MUSIT 5.0 — DATA FORMAT BENCHMARK
+# -------------------------------------------------------------
+#
+#   python benchmarks/bench_formats.py [record counts...]
+#
+# Save time, load time and file size of songs and history lists
+# in each of DATA_FORMATS (pretty / compact JSON, columnar).
+
+SIZES = [10_000, 100_000, 1_000_000]
+GENRES = ["Rock", "Pop", "Jazz", "Hip-Hop", "Classical", "Electronic"]
+
+
+def make_songs(rng, n):
+    return [
+        {"MusicID": i, "Title": f"Song {i} é", "Artist": f"Artist {i % 5000}",
+         "Genre": rng.choice(GENRES), "Duration": rng.randint(90, 400)}
+        for i in range(n)
+    ]
+
+
+def make_history(rng, n):
+    return [
+        {"id": rng.randrange(10000), "title": f"Song {i}", "artist": f"Artist {i % 500}",
+         "genre": rng.choice(GENRES), "duration": rng.randint(90, 400),
+         "timestamp": 1.7e9 + i * 3.7}
+        for i in range(n)
+    ]
+
+
+def main(sizes):
+    rng = random.Random(24)
+    with tempfile.TemporaryDirectory() as folder:
+        for kind, make in (("songs", make_songs), ("history", make_history)):
+            for n in sizes:
+                data = make(rng, n)
+                for fmt in DATA_FORMATS:
+                    path = os.path.join(folder, f"{kind}.{fmt}")
+
+                    start = time.perf_counter()
+                    save_json(path, data, fmt)
+                    saved = time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    back = load_json(path)
+                    loaded = time.perf_counter() - start
+
+                    assert back == data, f"{kind} {fmt} did not round-trip"
+                    print(f"{kind:7} {n:>9} {fmt:9} save {saved * 1000:8.0f} ms  "
+                          f"load {loaded * 1000:8.0f} ms  {os.path.getsize(path) / 1e6:7.2f} MB")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
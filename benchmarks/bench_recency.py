@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai  # noqa: E402
+from taste import TasteProfile  # noqa: E402
+
+
+# -------------------------------------------------------------
+# MUSIT 5.0 — RECENCY SCORING BENCHMARK
+# -------------------------------------------------------------
+#
+#   python benchmarks/bench_recency.py [history sizes...]
+#
+# recommend_ai() latency as a user's history grows to 1M plays.
+# Recency mode reads the running TasteProfile, so it should stay
+# flat; classic scoring without a profile re-reads the history
+# every call and is shown for comparison.
+
+CATALOG_SIZE = 10_000
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+CALLS = 50
+GENRES = ["Pop", "Rock", "Jazz", "Hip-Hop", "Classical", "Electronic", "R&B", "Lo-Fi"]
+
+
+def make_catalog(rng, n):
+    return [
+        {"MusicID": i + 1, "Title": f"Track {i}", "Artist": f"Artist {rng.randrange(n // 10)}",
+         "Genre": rng.choice(GENRES), "Duration": rng.randint(90, 420)}
+        for i in range(n)
+    ]
+
+
+def make_history(rng, songs, n):
+    now = time.time()
+    history = []
+    for i in range(n):
+        s = rng.choice(songs)
+        history.append({
+            "id": s["MusicID"], "title": s["Title"], "artist": s["Artist"],
+            "genre": s["Genre"], "duration": s["Duration"],
+            "timestamp": now - (n - i) * 60,  # one play a minute
+        })
+    return history
+
+
+def mean_ms(fn, calls=CALLS):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1000
+
+
+def main(sizes):
+    rng = random.Random(17)
+    songs = make_catalog(rng, CATALOG_SIZE)
+    print(f"catalog {CATALOG_SIZE} songs, NumPy {'on' if ai.np is not None else 'off'}, "
+          f"mean of {CALLS} calls")
+
+    for n in sizes:
+        history = make_history(rng, songs, n)
+        profile = TasteProfile.from_history(history, half_life_days=30)
+
+        ai.AI_SCORING = "recency"
+        recency = mean_ms(lambda h=history, p=profile: ai.recommend_ai(songs, h, p))
+
+        ai.AI_SCORING = "classic"
+        classic = mean_ms(lambda h=history: ai.recommend_ai(songs, h), calls=max(1, CALLS // 10))
+
+        print(f"history {n:>9}: recency + profile {recency:7.2f} ms   "
+              f"classic, no profile {classic:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
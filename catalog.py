@@ -0,0 +1,565 @@
+import os
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping, Sequence
+
+try:
+    import numpy as np  # optional: faster column sorts
+except ImportError:
+    np = None
+
+
+# -------------------------------------------------------------
+# MUSIT 5.0 — SONG CATALOG
+# -------------------------------------------------------------
+
+# "dicts": a list of song dicts (Catalog)
+# "columnar": one array per field behind row views (ColumnarCatalog)
+CATALOG_LAYOUT = os.environ.get("MUSIT_CATALOG", "dicts")
+
+
+def normalize(text):
+    """
+    Lowercase and collapse whitespace: "  As  It Was " -> "as it was"
+    """
+    return " ".join(text.lower().split())
+
+
+# -------------------- PREFIX INDEX -----------------------------
+
+class PrefixIndex:
+    """
+    Sorted array of normalized titles and artists.
+    A prefix query is one bisect plus a walk over the matches,
+    so completions come back in O(log n + N).
+    """
+
+    def __init__(self, songs):
+        entries = []
+        for pos, s in enumerate(songs):
+            entries.append((normalize(s["Title"]), s["Title"], pos))
+            entries.append((normalize(s["Artist"]), s["Artist"], pos))
+        entries.sort()
+
+        self.songs = songs
+        self.keys = [e[0] for e in entries]
+        self.texts = [e[1] for e in entries]
+        self.positions = [e[2] for e in entries]
+
+    def _matches(self, prefix):
+        prefix = normalize(prefix)
+        i = bisect_left(self.keys, prefix)
+        while i < len(self.keys) and self.keys[i].startswith(prefix):
+            yield i
+            i += 1
+
+    def complete(self, prefix, n=10):
+        """
+        Up to n distinct titles/artists starting with prefix, A-Z.
+        """
+        results = []
+        seen = set()
+        for i in self._matches(prefix):
+            if self.keys[i] not in seen:
+                seen.add(self.keys[i])
+                results.append(self.texts[i])
+                if len(results) == n:
+                    break
+        return results
+
+    def songs_with_prefix(self, prefix, n=10):
+        """
+        Up to n songs whose title or artist starts with prefix.
+        """
+        results = []
+        seen = set()
+        for i in self._matches(prefix):
+            pos = self.positions[i]
+            if pos not in seen:
+                seen.add(pos)
+                results.append(self.songs[pos])
+                if len(results) == n:
+                    break
+        return results
+
+
+# -------------------- INDEXED CATALOG --------------------------
+
+class CatalogIndex:
+    """
+    Hash indexes by MusicID, lowercase title, artist and genre and
+    the lookups built on them, shared by both catalog layouts.
+    Subclasses hold the songs and bump version on every change.
+    """
+
+    version = 0     # caches keyed on it rebuild when it changes
+    ids = None      # MusicID -> position
+    titles = None   # lowercase title -> [positions]
+    artists = None  # lowercase artist -> [positions]
+    genres = None   # lowercase genre -> [positions]
+    _prefix = None  # PrefixIndex, built on first use
+
+    # ---------------- INDEX MAINTENANCE ----------------
+
+    def reindex(self):
+        """
+        Rebuild every index from scratch.
+        Call after mutating the list in place (sort, remove, ...).
+        """
+        self.ids = {}
+        self.titles = {}
+        self.artists = {}
+        self.genres = {}
+
+        for pos, s in enumerate(self):
+            self._index(pos, s)
+
+        self.version += 1
+        self._prefix = None
+
+    def _index(self, pos, song):
+        # first song with an ID / title wins, like the old linear scans
+        self.ids.setdefault(song["MusicID"], pos)
+        self.titles.setdefault(song["Title"].lower(), []).append(pos)
+        self.artists.setdefault(song["Artist"].lower(), []).append(pos)
+        self.genres.setdefault(song["Genre"].lower(), []).append(pos)
+
+    # ---------------- LOOKUPS ----------------
+
+    def find_id(self, song_id):
+        """
+        O(1) lookup by MusicID.
+        """
+        pos = self.ids.get(song_id)
+        return self[pos] if pos is not None else None
+
+    def find_title(self, title):
+        """
+        O(1) case-insensitive exact title lookup.
+        """
+        positions = self.titles.get(title.lower())
+        return self[positions[0]] if positions else None
+
+    def by_artist(self, artist):
+        """
+        All songs by an artist (case-insensitive exact match).
+        """
+        return [self[p] for p in self.artists.get(artist.lower(), [])]
+
+    def by_genre(self, genre):
+        """
+        All songs of a genre (case-insensitive exact match).
+        """
+        return [self[p] for p in self.genres.get(genre.lower(), [])]
+
+    def search_artist(self, text):
+        """
+        Substring search over distinct artist names.
+        Cost is O(artists + matches) instead of O(catalog).
+        """
+        return self._search(self.artists, text)
+
+    def search_genre(self, text):
+        """
+        Substring search over distinct genre names.
+        """
+        return self._search(self.genres, text)
+
+    def prefix_index(self):
+        """
+        PrefixIndex for autocomplete, built on first use.
+        """
+        if self._prefix is None:
+            self._prefix = PrefixIndex(self)
+        return self._prefix
+
+    def _search(self, index, text):
+        text = text.lower()
+        positions = []
+        for key, pos_list in index.items():
+            if text in key:
+                positions.extend(pos_list)
+
+        # keep catalog order, like the old list comprehension
+        positions.sort()
+        return [self[p] for p in positions]
+
+    # ---------------- SORT / FILTER ----------------
+
+    def sort_by(self, field, reverse=False):
+        """
+        Songs ordered by one field; same order as sorted(key=...).
+        """
+        return sorted(self, key=lambda s: s[field], reverse=reverse)
+
+    def where(self, field, values):
+        """
+        Songs whose field is one of values, in catalog order.
+        """
+        values = set(values)
+        return [s for s in self if s[field] in values]
+
+
+class Catalog(CatalogIndex, list):
+    """
+    Song list with hash indexes by MusicID, lowercase title,
+    artist and genre.
+    Behaves like the plain list from load_songs(), so loops,
+    len(), random.choice() and save_songs() keep working.
+    """
+
+    def __init__(self, songs=()):
+        super().__init__(songs)
+        self.version = 0
+        self._prefix = None
+        self.reindex()
+
+    def append(self, song):
+        super().append(song)
+        self._index(len(self) - 1, song)
+        self.version += 1
+        self._prefix = None
+
+    def extend(self, songs):
+        start = len(self)
+        super().extend(songs)
+        for pos in range(start, len(self)):
+            self._index(pos, self[pos])
+        self.version += 1
+        self._prefix = None
+
+    def remove_id(self, song_id):
+        """
+        Remove a song by MusicID. Returns the removed song or None.
+        """
+        pos = self.ids.get(song_id)
+        if pos is None:
+            return None
+
+        song = self.pop(pos)
+        self.reindex()
+        return song
+
+
+# -------------------- COLUMNAR CATALOG -------------------------
+
+CODED_FIELDS = ("Artist", "Genre")  # few distinct values: stored as codes
+
+_MISSING = object()  # field absent from a song
+
+
+class SongRow(MutableMapping):
+    """
+    One song of a ColumnarCatalog, read and written like a song dict.
+    Tied to the song rather than its position, so it stays valid
+    when other songs are removed.
+    """
+
+    __slots__ = ("_catalog", "_row")
+
+    def __init__(self, catalog, row):
+        self._catalog = catalog
+        self._row = row
+
+    def __getitem__(self, key):
+        # ColumnarCatalog._get() inlined: this is the hot path
+        catalog = self._catalog
+        column = catalog._columns.get(key)
+        if column is None:
+            raise KeyError(key)
+        value = column[self._row]
+        vocab = catalog._vocab.get(key)
+        if vocab is not None:
+            value = vocab[value]
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._catalog._set(self._row, key, value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._catalog._set(self._row, key, _MISSING)
+
+    def __iter__(self):
+        return self._catalog._keys(self._row)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class ColumnarCatalog(CatalogIndex, Sequence):
+    """
+    Catalog that stores each field as one column instead of one dict
+    per song: MusicID and Duration in int64/float64 arrays, Artist
+    and Genre as array codes into a table of distinct values, Title
+    and any other field in plain lists. Each song has one SongRow
+    view, so s["Title"] code, find_song() and save_songs() work
+    unchanged and the same song is always the same object.
+    Removed songs only leave the position order; their data stays so
+    existing views keep reading the right values.
+    """
+
+    def __init__(self, songs=()):
+        # field -> column, in song dict key order
+        self._columns = {
+            "MusicID": array("q"), "Title": [], "Artist": array("I"),
+            "Genre": array("I"), "Duration": array("q"),
+        }
+        self._vocab = {field: [] for field in CODED_FIELDS}   # values by code
+        self._codes = {field: {} for field in CODED_FIELDS}   # value -> code
+        self._rows = 0             # stored songs, removed ones included
+        self._order = array("q")   # catalog position -> stored row
+        self._songs = []           # catalog position -> SongRow
+        self._sorted = {}          # (field, reverse) -> (version, positions)
+        self.version = 0
+        self._prefix = None
+
+        self._add_rows(songs)
+        self.reindex()
+
+    # ---------------- COLUMN STORAGE ----------------
+
+    def _code(self, field, value):
+        codes = self._codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self._vocab[field])
+            self._vocab[field].append(value)
+        return code
+
+    def _add_rows(self, songs):
+        songs = [s if isinstance(s, dict) else dict(s) for s in songs]
+        for song in songs:
+            for field in song:
+                if field not in self._columns:
+                    self._columns[field] = [_MISSING] * self._rows
+
+        for field, column in self._columns.items():
+            values = [s.get(field, _MISSING) for s in songs]
+            if field in self._vocab:
+                column.extend(self._code(field, v) for v in values)
+            elif isinstance(column, array):
+                self._columns[field] = self._extend_array(column, values)
+            else:
+                column.extend(values)
+
+        rows = range(self._rows, self._rows + len(songs))
+        self._order.extend(rows)
+        self._songs.extend(SongRow(self, row) for row in rows)
+        self._rows += len(songs)
+
+    @staticmethod
+    def _extend_array(column, values):
+        """
+        Append to a numeric column; falls back to a list (keeping
+        every value's exact type) once a value doesn't fit.
+        """
+        if not column and values:
+            if all(type(v) is float for v in values):
+                column = array("d")
+            elif not all(type(v) is int for v in values):
+                return list(values)
+
+        kind = int if column.typecode == "q" else float
+        if all(type(v) is kind for v in values):
+            try:
+                column.extend(values)
+                return column
+            except OverflowError:
+                pass
+        return column.tolist() + list(values)
+
+    def _get(self, row, field):
+        column = self._columns.get(field)
+        if column is None:
+            raise KeyError(field)
+        value = column[row]
+        if field in self._vocab:
+            value = self._vocab[field][value]
+        if value is _MISSING:
+            raise KeyError(field)
+        return value
+
+    def _set(self, row, field, value):
+        column = self._columns.get(field)
+        if column is None:
+            column = self._columns[field] = [_MISSING] * self._rows
+
+        if field in self._vocab:
+            column[row] = self._code(field, value)
+        elif isinstance(column, array) and type(value) is (
+                int if column.typecode == "q" else float):
+            try:
+                column[row] = value
+            except OverflowError:
+                self._columns[field] = column = column.tolist()
+                column[row] = value
+        else:
+            if isinstance(column, array):
+                self._columns[field] = column = column.tolist()
+            column[row] = value
+
+        # like editing a dict in a Catalog: call reindex() if an
+        # indexed field changed; caches keyed on version rebuild
+        self.version += 1
+        self._prefix = None
+
+    def _keys(self, row):
+        for field in self._columns:
+            try:
+                self._get(row, field)
+            except KeyError:
+                continue
+            yield field
+
+    def column(self, field):
+        """
+        Every song's value for field, in catalog order.
+        """
+        column = self._columns[field]
+        values = [column[row] for row in self._order]
+        if field in self._vocab:
+            vocab = self._vocab[field]
+            values = [vocab[code] for code in values]
+        return values
+
+    # ---------------- SEQUENCE ----------------
+
+    def __len__(self):
+        return len(self._songs)
+
+    def __getitem__(self, pos):
+        return self._songs[pos]
+
+    def __iter__(self):
+        return iter(self._songs)
+
+    def append(self, song):
+        self._add_rows([song])
+        self._index(len(self) - 1, self[-1])
+        self.version += 1
+        self._prefix = None
+
+    def extend(self, songs):
+        start = len(self)
+        self._add_rows(songs)
+        for pos in range(start, len(self)):
+            self._index(pos, self[pos])
+        self.version += 1
+        self._prefix = None
+
+    def remove_id(self, song_id):
+        """
+        Remove a song by MusicID. Returns the removed song or None.
+        """
+        pos = self.ids.get(song_id)
+        if pos is None:
+            return None
+
+        self._order.pop(pos)
+        song = self._songs.pop(pos)
+        self.reindex()
+        return song
+
+    # ---------------- INDEXES ----------------
+
+    def reindex(self):
+        """
+        Rebuild every index straight from the columns.
+        """
+        self.ids = {}
+        self.titles = {}
+        ids, titles = self._columns["MusicID"], self._columns["Title"]
+        for pos, row in enumerate(self._order):
+            self.ids.setdefault(ids[row], pos)
+            self.titles.setdefault(titles[row].lower(), []).append(pos)
+
+        # lowercase each distinct artist / genre once, not once per song
+        for field, attr in (("Artist", "artists"), ("Genre", "genres")):
+            codes = self._columns[field]
+            names = [v.lower() if v is not _MISSING else v for v in self._vocab[field]]
+            index = {}
+            for pos, row in enumerate(self._order):
+                index.setdefault(names[codes[row]], []).append(pos)
+            setattr(self, attr, index)
+
+        self.version += 1
+        self._prefix = None
+
+    # ---------------- SORT / FILTER ----------------
+
+    def _sort_keys(self, field):
+        """
+        Per-position sort keys for field, in catalog order. Coded
+        fields sort by the rank of their value, so n small ints are
+        compared instead of n strings.
+        """
+        column = self._columns[field]
+        if field in self._vocab:
+            vocab = self._vocab[field]
+            rank = [0] * len(vocab)
+            for r, code in enumerate(sorted(range(len(vocab)), key=vocab.__getitem__)):
+                rank[code] = r
+            if np is not None:
+                return np.array(rank, dtype=np.int64)[self._positions(column)]
+            return [rank[column[row]] for row in self._order]
+
+        if np is not None and isinstance(column, array):
+            return self._positions(column)
+        return [column[row] for row in self._order]
+
+    def _positions(self, column):
+        """Column values in catalog order as a NumPy array."""
+        order = np.frombuffer(self._order, dtype=np.int64)
+        return np.frombuffer(column, dtype=column.typecode)[order]
+
+    def sort_by(self, field, reverse=False):
+        """
+        Songs ordered by one field; same order as sorted(key=...).
+        The order is kept until the catalog changes, so sorting by
+        the same field again only looks the songs up.
+        """
+        cached = self._sorted.get((field, reverse))
+        if cached is not None and cached[0] == self.version:
+            positions = cached[1]
+        else:
+            keys = self._sort_keys(field)
+            if np is not None and isinstance(keys, np.ndarray):
+                positions = np.argsort(-keys if reverse else keys, kind="stable").tolist()
+            else:
+                positions = sorted(range(len(keys)), key=keys.__getitem__, reverse=reverse)
+            self._sorted[(field, reverse)] = (self.version, positions)
+        return list(map(self._songs.__getitem__, positions))
+
+    def where(self, field, values):
+        """
+        Songs whose field is one of values, in catalog order.
+        """
+        column = self._columns[field]
+        songs = self._songs
+        if field not in self._vocab:
+            values = set(values)
+            return [songs[p] for p, row in enumerate(self._order) if column[row] in values]
+
+        wanted = [c for v, c in self._codes[field].items() if v in values]
+        if np is not None:
+            positions = np.flatnonzero(np.isin(self._positions(column), wanted)).tolist()
+        else:
+            wanted = set(wanted)
+            positions = [p for p, row in enumerate(self._order) if column[row] in wanted]
+        return [songs[p] for p in positions]
+
+
+def make_catalog(songs, layout=CATALOG_LAYOUT):
+    """
+    Catalog for the songs from load_songs(), in the chosen layout.
+    """
+    if layout == "columnar":
+        return ColumnarCatalog(songs)
+    return Catalog(songs)
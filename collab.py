@@ -0,0 +1,195 @@
+import os
+import math
+import json
+import threading
+from database import DATA_DIR, atomic_write, file_lock, load_history
+
+
+# -------------------------------------------------------------
+# MUSIT 5.0 — COLLABORATIVE FILTERING
+# -------------------------------------------------------------
+#
+# "Listeners also played": how often two songs are played close
+# together (same session, a few tracks apart) across all users.
+
+COOCCURRENCE_FILE = os.path.join(DATA_DIR, "cooccurrence.json")
+
+COLLAB_WINDOW = 5          # plays back that count as "played together"
+COLLAB_SESSION_GAP = 3600  # seconds; a longer pause starts a new session
+COLLAB_CANDIDATES = 50     # per-song neighbours kept ranked by raw count
+
+
+class CoOccurrence:
+    """
+    Sparse item-item co-occurrence counts (dict of dicts).
+    Each song also keeps its COLLAB_CANDIDATES most co-played songs,
+    maintained as counts grow, so a query only re-ranks that short
+    list by cosine similarity instead of the whole row.
+    """
+
+    def __init__(self, path=COOCCURRENCE_FILE):
+        self.path = path
+        self.counts = {}    # song id -> {song id: times played together}
+        self.plays = {}     # song id -> plays seen
+        self.top = {}       # song id -> {song id: count}, <= COLLAB_CANDIDATES
+        self.pending = []   # (entry, previous) recorded since the last load/save
+        self.lock = threading.Lock()
+        self.dirty = False
+
+    # ---------------- UPDATES ----------------
+
+    def _bump(self, a, b, rank=True):
+        row = self.counts.setdefault(a, {})
+        count = row[b] = row.get(b, 0) + 1
+        if not rank:
+            return
+
+        top = self.top.setdefault(a, {})
+        if b in top or len(top) < COLLAB_CANDIDATES:
+            top[b] = count
+            return
+
+        weakest = min(top, key=top.get)
+        if count > top[weakest]:
+            del top[weakest]
+            top[b] = count
+
+    def _add(self, entry, previous, rank=True):
+        """
+        Count entry as played with each of the previous entries
+        (oldest first) that are in the same session.
+        """
+        song = entry["id"]
+        self.plays[song] = self.plays.get(song, 0) + 1
+
+        t = entry.get("timestamp")
+        for prev in reversed(previous):
+            pt = prev.get("timestamp")
+            if t and pt and t - pt > COLLAB_SESSION_GAP:
+                break
+            if prev["id"] != song:
+                self._bump(song, prev["id"], rank)
+                self._bump(prev["id"], song, rank)
+            t = pt
+
+    def record(self, history):
+        """
+        Fold in the newest entry of a user's history. O(COLLAB_WINDOW).
+        """
+        if not history:
+            return
+        with self.lock:
+            entry, previous = history[-1], history[-COLLAB_WINDOW - 1:-1]
+            self._add(entry, previous)
+            if self.pending is not None:
+                self.pending.append((entry, previous))
+            self.dirty = True
+
+    def build(self, histories):
+        """
+        Rebuild from every user's full history.
+        """
+        with self.lock:
+            self.counts, self.plays = {}, {}
+            for history in histories.values():
+                for i, entry in enumerate(history):
+                    self._add(entry, history[max(0, i - COLLAB_WINDOW):i], rank=False)
+            self._rank_all()
+            self.pending = None  # the whole model replaces what is saved
+            self.dirty = True
+
+    def _rank_all(self):
+        self.top = {}
+        for a, row in self.counts.items():
+            if len(row) > COLLAB_CANDIDATES:
+                row = dict(sorted(row.items(), key=lambda x: -x[1])[:COLLAB_CANDIDATES])
+            self.top[a] = dict(row)
+
+    # ---------------- QUERIES ----------------
+
+    def also_played(self, song_id, n=10):
+        """
+        Up to n (song id, score) pairs, best first. Score is the cosine
+        of the two songs' co-play counts, so hits aren't favoured just
+        for being popular.
+        """
+        with self.lock:
+            top = self.top.get(song_id)
+            if not top:
+                return []
+            base = self.plays.get(song_id, 1)
+            scored = [
+                (c / math.sqrt(base * self.plays.get(other, 1)), other)
+                for other, c in top.items()
+            ]
+
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        return [(other, score) for score, other in scored[:n]]
+
+    # ---------------- PERSISTENCE ----------------
+
+    def save(self):
+        """
+        Write the model. Plays recorded since the last load are added
+        to the counts on disk (under file_lock), so sessions running
+        side by side don't overwrite each other's.
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+            with file_lock(self.path):
+                if self.pending:
+                    data = self._read()
+                    if data is not None:
+                        self._apply(data)
+                        for entry, previous in self.pending:
+                            self._add(entry, previous, rank=False)
+                        self._rank_all()
+                data = {
+                    "plays": self.plays,
+                    "counts": self.counts,
+                }
+                atomic_write(self.path, json.dumps(data, separators=(",", ":")))
+            self.pending = []
+            self.dirty = False
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _apply(self, data):
+        # JSON object keys are strings; song ids are ints
+        self.plays = {int(k): v for k, v in data["plays"].items()}
+        self.counts = {
+            int(a): {int(b): c for b, c in row.items()}
+            for a, row in data["counts"].items()
+        }
+
+    def load(self):
+        """
+        Read the saved model. Returns False if there is none.
+        """
+        data = self._read()
+        if data is None:
+            return False
+
+        with self.lock:
+            self._apply(data)
+            self._rank_all()
+            self.pending = []
+            self.dirty = False
+        return True
+
+
+def open_cooccurrence(path=COOCCURRENCE_FILE):
+    """
+    The saved model, or one built from all stored history.
+    """
+    model = CoOccurrence(path)
+    if not model.load():
+        model.build(load_history())
+        model.save()
+    return model
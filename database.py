@@ -1,75 +1,1429 @@
+import copy
 import json
 import os
+import re
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections.abc import Sequence
+from contextlib import contextmanager
+from urllib.parse import quote, unquote
+
+try:
+    import fcntl  # POSIX advisory file locks
+    msvcrt = None
+except ImportError:
+    fcntl = None
+    import msvcrt
 
 DATA_DIR = "data"
 SONG_FILE = os.path.join(DATA_DIR, "songs.json")
 USER_FILE = os.path.join(DATA_DIR, "users.json")
 HISTORY_FILE = os.path.join(DATA_DIR, "history.json")
 PLAYLIST_FILE = os.path.join(DATA_DIR, "playlists.json")
+SIMILAR_INDEX_FILE = os.path.join(DATA_DIR, "similar_index.npz")
 
+# append-only play log (history.jsonl) + per-user snapshots (history/)
+HISTORY_COMPACT_EVERY = 1000  # log records before background compaction
 
-def ensure_data_structure():
-    """Create necessary folders + files if missing."""
-    os.makedirs(DATA_DIR, exist_ok=True)
-
-    defaults = {
-        SONG_FILE: [],
-        USER_FILE: {},
-        HISTORY_FILE: {},
-        PLAYLIST_FILE: {}
-    }
+# storage backend: "json" (default) or "sqlite"
+STORAGE_BACKEND = os.environ.get("MUSIT_STORAGE", "json")
+SQLITE_FILE = os.environ.get("MUSIT_DB", os.path.join(DATA_DIR, "musit.db"))
 
-    for path, default_value in defaults.items():
-        if not os.path.exists(path):
-            with open(path, "w") as f:
-                json.dump(default_value, f, indent=4)
+# how data files are written: "pretty" (indented JSON), "compact"
+# (JSON without whitespace) or "columnar" (binary, one packed array
+# per field, for lists of records like songs and history; anything
+# else falls back to compact). Reading detects the format by itself.
+DATA_FORMAT = os.environ.get("MUSIT_FORMAT", "pretty")
+DATA_FORMATS = ("pretty", "compact", "columnar")
 
 
 def load_json(path):
-    with open(path, "r") as f:
-        return json.load(f)
+    with open(path, "rb") as f:
+        return decode_data(f.read())
+
+
+def save_json(path, data, fmt=None):
+    atomic_write(path, encode_data(data, fmt or DATA_FORMAT))
+
+
+def atomic_write(path, content):
+    """
+    Replace path with content (str or bytes) so that readers (and a
+    crash) only ever see the old file or the new one: temp file, fsync,
+    rename, fsync dir.
+    """
+    if isinstance(content, str):
+        content = content.encode("utf8")
+    folder = os.path.dirname(path) or "."
+    tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return  # directories can't be opened on Windows
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Exclusive advisory lock on path + ".lock", honoured by every
+    MUSIT process using the same data folder.
+    """
+    with open(path + ".lock", "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK gives up after ~10 s; keep waiting
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+_MISSING = object()
+
+
+def merge3(base, ours, theirs):
+    """
+    Three-way merge of JSON values: the changes we made to base,
+    replayed on top of theirs (what another session saved meanwhile).
+    Dicts merge key by key and lists keep their adds/removes on both
+    sides; for anything else both changed, ours wins.
+    """
+    if ours == base:
+        return theirs
+    if theirs == base or theirs == ours:
+        return ours
+
+    if isinstance(ours, dict) and isinstance(theirs, dict):
+        base = base if isinstance(base, dict) else {}
+        merged = {}
+        for key in list(theirs) + [k for k in ours if k not in theirs]:
+            value = merge3(base.get(key, _MISSING), ours.get(key, _MISSING),
+                           theirs.get(key, _MISSING))
+            if value is not _MISSING:
+                merged[key] = value
+        return merged
+
+    if isinstance(ours, list) and isinstance(theirs, list):
+        base = base if isinstance(base, list) else []
+        removed = [x for x in base if x not in ours]
+        merged = [x for x in theirs if x not in removed]
+        merged += [x for x in ours if x not in base and x not in merged]
+        return merged
+
+    return ours
+
+
+# -------------------------------------------------------------
+# SERIALIZATION
+# -------------------------------------------------------------
+#
+# Columnar layout:
+#   COLUMNAR_MAGIC
+#   uint32 header length + JSON header
+#     {"rows": n, "columns": [[name, type, bytes], ...], "extra": bytes}
+#   one blob per column, then the extra blob
+# Column types: "i" int64 array, "d" float64 array, "s" UTF-8 strings
+# joined by NUL, "j" JSON list. Keys missing from some rows go to the
+# extra blob, a JSON list of per-row dicts. Arrays are little-endian.
+
+COLUMNAR_MAGIC = b"MUSITC1\n"
+INT64_RANGE = (-2 ** 63, 2 ** 63)
+
+
+def _column_type(values):
+    kinds = {type(v) for v in values}
+    if kinds == {int} and INT64_RANGE[0] <= min(values) and max(values) < INT64_RANGE[1]:
+        return "i"
+    if kinds == {float}:
+        return "d"
+    if kinds == {str}:
+        return "s"
+    return "j"
+
+
+def _pack_array(code, values):
+    packed = array(code, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack_array(code, blob):
+    packed = array(code)
+    packed.frombytes(blob)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tolist()
+
+
+def encode_columnar(records):
+    """
+    Pack a list of dicts column by column.
+    """
+    keys = records[0].keys()
+    uniform = all(r.keys() == keys for r in records)
+    if uniform:
+        names = list(keys)
+    else:
+        names = [k for k in keys if all(k in r for r in records)]
+
+    columns, blobs = [], []
+    for name in names:
+        values = [r[name] for r in records]
+        kind = _column_type(values)
+        blob = None
+        if kind == "i":
+            blob = _pack_array("q", values)
+        elif kind == "d":
+            blob = _pack_array("d", values)
+        elif kind == "s":
+            text = "\0".join(values)
+            if text.count("\0") == len(values) - 1:  # no NUL inside a value
+                blob = text.encode("utf8")
+            else:
+                kind = "j"
+        if blob is None:
+            blob = json.dumps(values, separators=(",", ":")).encode("utf8")
+        columns.append([name, kind, len(blob)])
+        blobs.append(blob)
+
+    extra = b""
+    if not uniform:
+        common = set(names)
+        extra = [{k: v for k, v in r.items() if k not in common} for r in records]
+        extra = json.dumps(extra, separators=(",", ":")).encode("utf8")
+
+    header = json.dumps(
+        {"rows": len(records), "columns": columns, "extra": len(extra)}
+    ).encode("utf8")
+    return b"".join([COLUMNAR_MAGIC, struct.pack("<I", len(header)), header] + blobs + [extra])
+
+
+def decode_columnar(raw):
+    pos = len(COLUMNAR_MAGIC)
+    (size,) = struct.unpack_from("<I", raw, pos)
+    pos += 4
+    header = json.loads(raw[pos:pos + size])
+    pos += size
+
+    names, columns = [], []
+    for name, kind, length in header["columns"]:
+        blob = raw[pos:pos + length]
+        pos += length
+        if kind == "i":
+            values = _unpack_array("q", blob)
+        elif kind == "d":
+            values = _unpack_array("d", blob)
+        elif kind == "s":
+            values = blob.decode("utf8").split("\0")
+        else:
+            values = json.loads(blob)
+        names.append(name)
+        columns.append(values)
+
+    if columns:
+        records = [dict(zip(names, row)) for row in zip(*columns)]
+    else:
+        records = [{} for _ in range(header["rows"])]
+
+    if header["extra"]:
+        for record, more in zip(records, json.loads(raw[pos:pos + header["extra"]])):
+            record.update(more)
+    return records
+
+
+def encode_data(data, fmt=DATA_FORMAT):
+    """
+    Serialize data in one of DATA_FORMATS; bytes for columnar, else str.
+    """
+    if fmt not in DATA_FORMATS:
+        raise ValueError(f"unknown data format: {fmt}")
+    if isinstance(data, Sequence) and not isinstance(data, (list, tuple, str)):
+        data = [dict(r) for r in data]  # row views, e.g. a ColumnarCatalog
+    if fmt == "pretty":
+        return json.dumps(data, indent=4)
+    if (fmt == "columnar" and isinstance(data, list) and data
+            and all(isinstance(r, dict) for r in data)):
+        return encode_columnar(data)
+    return json.dumps(data, separators=(",", ":"))
+
+
+def decode_data(raw):
+    """
+    Parse bytes written in any of DATA_FORMATS.
+    """
+    if raw.startswith(COLUMNAR_MAGIC):
+        return decode_columnar(raw)
+    return json.loads(raw)
+
+
+def user_key(username):
+    """
+    Filesystem-safe, reversible file name for a username. It has no
+    upper-case characters ("Bob" -> "^bob", "." -> "%2e"), so names
+    differing only in case get different files on case-insensitive
+    filesystems too.
+    """
+    key = quote(username, safe="").replace(".", "%2E")
+    return re.sub(
+        r"%[0-9A-F]{2}|[A-Z]",
+        lambda m: m.group().lower() if m.group()[0] == "%" else "^" + m.group().lower(),
+        key,
+    )
+
+
+def username_from_key(key):
+    """
+    Inverse of user_key().
+    """
+    return unquote(re.sub(r"\^([a-z])", lambda m: m.group(1).upper(), key))
+
+
+# -------------------------------------------------------------
+# PARSED FILE CACHE
+# -------------------------------------------------------------
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    # atomic_write always swaps in a new inode, so a replace within the
+    # mtime granularity that keeps the size still changes the stamp
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+class WriteConflict(Exception):
+    """
+    Another session saved a file since it was read, and the save
+    can't be merged into theirs.
+    """
+
+
+class JsonCache:
+    """
+    Parsed JSON files kept in memory. Every read checks the file's
+    mtime and size, so changes made by another session are picked up;
+    otherwise the file is parsed once. Writes go straight through to
+    disk, or are held until the end of a batch() block so several
+    saves of one file cost a single write.
+    Cached data is shared: change it only to save it back.
+
+    The stamp of the last read is the file's version. A save checks it
+    under the file lock; if another session wrote in between, a
+    mergeable save replays our changes onto theirs (merge3) and any
+    other save raises WriteConflict instead of overwriting them.
+    """
+
+    def __init__(self):
+        self.entries = {}     # path -> (stamp, data)
+        self.pending = None   # inside batch(): path -> (base stamp, base data, merge)
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.conflicts = 0
+        self.parse_time = 0.0
+
+    def load(self, path):
+        return self.load_entry(path)[1]
+
+    def load_entry(self, path):
+        """
+        (stamp, data) for path: the data and the version it was read at.
+        """
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry and self.pending is not None and path in self.pending:
+                self.hits += 1
+                return entry
+
+            stamp = _file_stamp(path)
+            if entry and stamp is not None and entry[0] == stamp:
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            start = time.perf_counter()
+            data = load_json(path)
+            self.parse_time += time.perf_counter() - start
+            entry = self.entries[path] = (stamp, data)
+            return entry
+
+    def cached(self, path):
+        """
+        The (stamp, data) last read or written, without checking disk.
+        """
+        with self.lock:
+            return self.entries.get(path, (None, None))
+
+    def save(self, path, data, merge=False, base=None):
+        """
+        Write data to path. base is the (stamp, data) the caller's
+        copy was made from; by default the last one read here.
+        """
+        with self.lock:
+            base_stamp, base = base or self.entries.get(path, (None, None))
+            if self.pending is None:
+                self._write(path, data, base_stamp, base, merge)
+                return
+
+            if path in self.pending:
+                base_stamp = self.pending[path][0]
+            else:
+                self.pending[path] = (base_stamp, base, merge)
+            self.entries[path] = (base_stamp, data)
+
+    def _write(self, path, data, base_stamp, base, merge):
+        with file_lock(path):
+            stamp = _file_stamp(path)
+            if stamp is not None and stamp != base_stamp:
+                # another session saved since we read (or created) this file
+                self.conflicts += 1
+                if not merge:
+                    raise WriteConflict(f"{path} was changed by another session")
+                data = merge3(base, data, load_json(path))
+
+            save_json(path, data)
+            self.writes += 1
+            self.entries[path] = (_file_stamp(path), data)
+
+    @contextmanager
+    def batch(self):
+        """
+        Hold writes until the block ends, then write each file once.
+        """
+        with self.lock:
+            outer = self.pending is None
+            if outer:
+                self.pending = {}
+        try:
+            yield
+        finally:
+            if outer:
+                with self.lock:
+                    pending, self.pending = self.pending, None
+                    conflict = None
+                    for path, (base_stamp, base, merge) in pending.items():
+                        try:
+                            self._write(path, self.entries[path][1], base_stamp, base, merge)
+                        except WriteConflict as e:
+                            conflict = conflict or e  # still write the other files
+                    if conflict:
+                        raise conflict
+
+    def invalidate(self, path=None):
+        with self.lock:
+            if path is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(path, None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "conflicts": self.conflicts,
+                "parse_time": self.parse_time,
+            }
+
+
+JSON_CACHE = JsonCache()
+
+
+class ShardSnapshot(dict):
+    """
+    {username: data} from JsonStorage.load_users() / load_playlists(),
+    plus the (stamp, data) each shard was read at, so saving it back
+    merges with newer changes instead of overwriting them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bases = {}
+
+
+# -------------------------------------------------------------
+# STORAGE INTERFACE
+# -------------------------------------------------------------
+
+class Storage:
+    """
+    What every storage backend provides.
+    The per-user methods default to load-modify-save of the
+    whole collection; backends override them when they can
+    update a single user's rows directly.
+    """
+
+    def ensure(self):
+        raise NotImplementedError
+
+    # SONGS
+    def load_songs(self):
+        raise NotImplementedError
+
+    def save_songs(self, songs, changed=None):
+        """
+        changed: optional positions of the only rows that differ
+        from what is stored (a hint; backends may rewrite it all).
+        """
+        raise NotImplementedError
+
+    # USERS
+    def load_users(self):
+        raise NotImplementedError
+
+    def save_users(self, data):
+        raise NotImplementedError
+
+    def load_user(self, username):
+        return self.load_users().get(username)
+
+    def save_user(self, username, record):
+        data = self.load_users()
+        data[username] = record
+        self.save_users(data)
+
+    # PLAYLISTS
+    def load_playlists(self):
+        raise NotImplementedError
+
+    def save_playlists(self, data):
+        raise NotImplementedError
+
+    def load_user_playlists(self, username):
+        return self.load_playlists().get(username, {})
+
+    def save_user_playlists(self, username, playlists):
+        data = self.load_playlists()
+        data[username] = playlists
+        self.save_playlists(data)
+
+    # HISTORY
+    def append_history(self, username, entry):
+        raise NotImplementedError
+
+    def load_user_history(self, username):
+        raise NotImplementedError
+
+    def save_user_history(self, username, entries):
+        raise NotImplementedError
+
+    def history_users(self):
+        raise NotImplementedError
+
+    def compact_history(self):
+        pass
+
+    def load_history(self):
+        return {u: self.load_user_history(u) for u in self.history_users()}
+
+    def save_history(self, data):
+        for username, entries in data.items():
+            self.save_user_history(username, entries)
+
+
+# -------------------------------------------------------------
+# JSON FILE BACKEND
+# -------------------------------------------------------------
+
+class JsonStorage(Storage):
+    """
+    JSON files under data/. Songs are one file; everything per user
+    is sharded into one file per user, so saving a user touches only
+    that user's data:
+      users/<user>.json       account record
+      playlists/<user>.json   {playlist name: [MusicID, ...]}
+      history/<user>.json     play snapshot
+    Plays are appended as one compact JSON line ([username, entry])
+    to the history log, so logging a play costs the same no matter
+    how large history gets. A background compactor folds the log
+    into the per-user history snapshots.
+    The old single users/playlists/history.json files are migrated
+    into shards by ensure().
+    """
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self.song_file = os.path.join(data_dir, "songs.json")
+        self.user_file = os.path.join(data_dir, "users.json")
+        self.history_file = os.path.join(data_dir, "history.json")
+        self.playlist_file = os.path.join(data_dir, "playlists.json")
+        self.history_log = os.path.join(data_dir, "history.jsonl")
+        self.history_dir = os.path.join(data_dir, "history")
+        self.user_dir = os.path.join(data_dir, "users")
+        self.playlist_dir = os.path.join(data_dir, "playlists")
+
+        # thread locks for this process, file locks for other sessions
+        self._history_lock = threading.Lock()
+        self._compact_lock = threading.Lock()  # one compaction at a time
+        self._log_records = None  # records in the live log (lazy count)
+        self._compactor = None
+
+    def ensure(self):
+        """Create necessary folders + files if missing."""
+        os.makedirs(self.data_dir, exist_ok=True)
+
+        defaults = {
+            self.song_file: [],
+            self.user_file: {},
+            self.history_file: {},
+            self.playlist_file: {}
+        }
+
+        for path, default_value in defaults.items():
+            if not os.path.exists(path):
+                save_json(path, default_value)
+
+        os.makedirs(self.history_dir, exist_ok=True)
+        os.makedirs(self.user_dir, exist_ok=True)
+        os.makedirs(self.playlist_dir, exist_ok=True)
+        self.migrate_shard_names()
+        self.migrate_legacy_history()
+        self.migrate_legacy_shards()
+
+    # ---------------- SONGS ----------------
+
+    def load_songs(self):
+        return JSON_CACHE.load(self.song_file)
+
+    def save_songs(self, songs, changed=None):
+        JSON_CACHE.save(self.song_file, songs)
+
+    # ---------------- PER-USER SHARDS ----------------
+
+    @staticmethod
+    def _shard_path(folder, username):
+        return os.path.join(folder, user_key(username) + ".json")
+
+    @staticmethod
+    def _shard_users(folder):
+        if not os.path.isdir(folder):
+            return []
+        return sorted(
+            username_from_key(f[:-5]) for f in os.listdir(folder) if f.endswith(".json")
+        )
+
+    def _load_shard(self, folder, username, default=None):
+        path = self._shard_path(folder, username)
+        try:
+            return JSON_CACHE.load(path)
+        except FileNotFoundError:
+            return default
+
+    def _save_shard(self, folder, username, data):
+        JSON_CACHE.save(self._shard_path(folder, username), data, merge=True)
+
+    def _load_all(self, folder):
+        snapshot = ShardSnapshot()
+        for username in self._shard_users(folder):
+            try:
+                stamp, data = JSON_CACHE.load_entry(self._shard_path(folder, username))
+            except FileNotFoundError:
+                continue  # deleted since listdir()
+            # a copy, so _save_all() can tell what the caller changed
+            snapshot[username] = copy.deepcopy(data)
+            snapshot.bases[username] = (stamp, data)
+        return snapshot
+
+    def _save_all(self, folder, data):
+        """
+        Make the shards match data: write changed users, merged with
+        what other sessions saved since data was loaded, and drop the
+        loaded users that data no longer has. Users created by another
+        session in the meantime are left alone.
+        """
+        bases = getattr(data, "bases", None)
+        if bases is None:
+            bases = {}  # plain dict: compare with what this session last saw
+        else:
+            for username in set(bases) - set(data):
+                path = self._shard_path(folder, username)
+                with file_lock(path):
+                    JSON_CACHE.invalidate(path)
+                    if os.path.exists(path):
+                        os.remove(path)
+
+        for username, value in data.items():
+            path = self._shard_path(folder, username)
+            base = bases.get(username) or JSON_CACHE.cached(path)
+            if base[1] != value:
+                JSON_CACHE.save(path, copy.deepcopy(value), merge=True, base=base)
+
+    # ---------------- USERS / PLAYLISTS ----------------
+
+    def load_users(self):
+        return self._load_all(self.user_dir)
+
+    def save_users(self, data):
+        self._save_all(self.user_dir, data)
+
+    def load_user(self, username):
+        # a copy: the caller may edit it without saving
+        return copy.deepcopy(self._load_shard(self.user_dir, username))
+
+    def save_user(self, username, record):
+        self._save_shard(self.user_dir, username, copy.deepcopy(record))
+
+    def load_playlists(self):
+        return self._load_all(self.playlist_dir)
+
+    def save_playlists(self, data):
+        self._save_all(self.playlist_dir, data)
+
+    def load_user_playlists(self, username):
+        return copy.deepcopy(self._load_shard(self.playlist_dir, username, {}))
+
+    def save_user_playlists(self, username, playlists):
+        self._save_shard(self.playlist_dir, username, copy.deepcopy(playlists))
+
+    def migrate_legacy_shards(self):
+        """
+        Split the old single users.json / playlists.json into per-user
+        shards. Shards that already exist are newer and win.
+        Returns {"users": n, "playlists": n} moved.
+        """
+        moved = {}
+        for legacy, folder, name in (
+            (self.user_file, self.user_dir, "users"),
+            (self.playlist_file, self.playlist_dir, "playlists"),
+        ):
+            moved[name] = 0
+            if not os.path.exists(legacy):
+                continue
+            data = load_json(legacy)
+            for username, value in data.items():
+                if not os.path.exists(self._shard_path(folder, username)):
+                    save_json(self._shard_path(folder, username), value)
+                    moved[name] += 1
+            if data:
+                save_json(legacy, {})
+        return moved
+
+    def migrate_shard_names(self):
+        """
+        Rename per-user files written before user_key() became all lower
+        case ("Bob.json" -> "^bob.json", "a%2Eb.json" -> "a%2eb.json").
+        A file that already exists under the new name is newer and wins.
+        Returns the number of files renamed.
+        """
+        renamed = 0
+        for folder in (self.user_dir, self.playlist_dir, self.history_dir):
+            if not os.path.isdir(folder):
+                continue
+            for f in os.listdir(folder):
+                stem = f[:-5]
+                # new keys are all lower case; old ones kept letters and
+                # wrote %XX escapes in upper case ("Bob", "bob%2Esmith")
+                if not f.endswith(".json") or not re.search(r"[A-Z]", stem):
+                    continue
+                old = os.path.join(folder, f)
+                new = os.path.join(folder, user_key(unquote(stem)) + ".json")
+                with file_lock(new):
+                    JSON_CACHE.invalidate(old)
+                    JSON_CACHE.invalidate(new)
+                    # on a case-insensitive filesystem "a%2Eb" already is "a%2eb"
+                    if os.path.exists(new) and not os.path.samefile(old, new):
+                        os.remove(old)
+                    else:
+                        os.replace(old, new)
+                        renamed += 1
+        return renamed
 
+    # ---------------- HISTORY LOG ----------------
 
-def save_json(path, data):
-    with open(path, "w") as f:
-        json.dump(data, f, indent=4)
+    def _snapshot_path(self, username):
+        return os.path.join(self.history_dir, user_key(username) + ".json")
+
+    def _log_files(self):
+        """
+        Live log plus any logs rotated out by a running compactor.
+        """
+        rotated = []
+        if os.path.isdir(self.history_dir):
+            rotated = sorted(
+                os.path.join(self.history_dir, f)
+                for f in os.listdir(self.history_dir) if f.endswith(".compacting")
+            )
+        return rotated + [self.history_log]
+
+    @staticmethod
+    def _read_log(path, username=None):
+        """
+        Yield (username, entry) records from a log file.
+        With a username, other users' lines are skipped without decoding.
+        """
+        if not os.path.exists(path):
+            return
+
+        prefix = "[" + json.dumps(username) + "," if username is not None else None
+
+        with open(path, "r", encoding="utf8") as f:
+            for line in f:
+                if prefix is not None and not line.startswith(prefix):
+                    continue
+                try:
+                    user, entry = json.loads(line)
+                except ValueError:
+                    continue  # torn write from a crash
+                yield user, entry
+
+    @staticmethod
+    def _read_snapshot(path):
+        try:
+            return load_json(path)
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _write_compact(path, data):
+        # snapshots are never pretty-printed: they are rewritten often
+        save_json(path, data, "columnar" if DATA_FORMAT == "columnar" else "compact")
+
+    @contextmanager
+    def _log_lock(self):
+        """Held while the live log or the snapshots change hands."""
+        with self._history_lock, file_lock(self.history_log):
+            yield
+
+    @contextmanager
+    def _compacting(self):
+        """One compaction at a time, across every session."""
+        with self._compact_lock, file_lock(os.path.join(self.history_dir, "compact")):
+            yield
+
+    def append_history(self, username, entry):
+        """
+        Append a single play record. O(1), never rewrites old plays.
+        """
+        line = json.dumps([username, entry], separators=(",", ":")) + "\n"
+
+        with self._log_lock():
+            if self._log_records is None:
+                self._log_records = sum(1 for _ in self._read_log(self.history_log))
+
+            with open(self.history_log, "a", encoding="utf8") as f:
+                f.write(line)
+            self._log_records += 1
+
+            if self._log_records >= HISTORY_COMPACT_EVERY:
+                self._start_background_compaction()
+
+    def load_user_history(self, username):
+        """
+        Load one user's plays: their snapshot plus any pending log records.
+        """
+        with self._log_lock():
+            entries = self._read_snapshot(self._snapshot_path(username))
+            for path in self._log_files():
+                entries.extend(e for _, e in self._read_log(path, username))
+        return entries
+
+    def save_user_history(self, username, entries):
+        """
+        Replace one user's history (e.g. when clearing it).
+        """
+        with self._compacting():
+            self._compact_history()
+            with self._log_lock():
+                self._write_compact(self._snapshot_path(username), entries)
+
+    def compact_history(self):
+        """
+        Fold the append log into the per-user snapshots.
+        Appends keep going to a fresh log while this runs.
+        """
+        with self._compacting():
+            self._compact_history()
+
+    def _compact_history(self):
+        with self._log_lock():
+            # we hold the compaction lock, so any rotated log still
+            # around was left by a session that died mid-compaction
+            rotated = self._log_files()[:-1]
+            if os.path.exists(self.history_log):
+                path = os.path.join(
+                    self.history_dir, f"{os.getpid()}-{threading.get_ident()}.compacting"
+                )
+                os.replace(self.history_log, path)
+                rotated.append(path)
+            self._log_records = 0
+        if not rotated:
+            return
+
+        pending = {}
+        for path in rotated:
+            for user, entry in self._read_log(path):
+                pending.setdefault(user, []).append(entry)
+
+        # write new snapshots aside, then swap them in under the lock
+        staged = []
+        for user, entries in pending.items():
+            path = self._snapshot_path(user)
+            with self._log_lock():
+                merged = self._read_snapshot(path) + entries
+            self._write_compact(path + ".staged", merged)
+            staged.append(path)
+
+        with self._log_lock():
+            for path in staged:
+                os.replace(path + ".staged", path)
+            for path in rotated:
+                os.remove(path)
+
+    def _start_background_compaction(self):
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact_history, daemon=True)
+        self._compactor.start()
+
+    def wait_for_compaction(self):
+        """
+        Block until a running background compaction finishes.
+        """
+        if self._compactor is not None:
+            self._compactor.join()
+
+    def history_users(self):
+        """
+        Every username with recorded history.
+        """
+        users = set()
+        if os.path.isdir(self.history_dir):
+            users.update(
+                username_from_key(f[:-5])
+                for f in os.listdir(self.history_dir) if f.endswith(".json")
+            )
+        for path in self._log_files():
+            users.update(u for u, _ in self._read_log(path))
+        return sorted(users)
+
+    def migrate_legacy_history(self):
+        """
+        Move plays from the old single history.json into per-user snapshots.
+        """
+        legacy = load_json(self.history_file)
+        if not legacy:
+            return
+
+        for username, entries in legacy.items():
+            existing = self._read_snapshot(self._snapshot_path(username))
+            self._write_compact(self._snapshot_path(username), entries + existing)
+
+        save_json(self.history_file, {})
+
+
+# -------------------------------------------------------------
+# SQLITE BACKEND
+# -------------------------------------------------------------
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS songs (
+    music_id  INTEGER PRIMARY KEY,
+    position  INTEGER NOT NULL,
+    title     TEXT NOT NULL,
+    artist    TEXT NOT NULL,
+    genre     TEXT NOT NULL,
+    duration  NUMERIC NOT NULL,
+    extra     TEXT
+);
+CREATE INDEX IF NOT EXISTS songs_position ON songs(position);
+
+CREATE TABLE IF NOT EXISTS users (
+    username  TEXT PRIMARY KEY,
+    record    TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS history (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    username  TEXT NOT NULL,
+    music_id  INTEGER,
+    timestamp REAL,
+    entry     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_user ON history(username, id);
+CREATE INDEX IF NOT EXISTS history_song ON history(music_id);
+
+CREATE TABLE IF NOT EXISTS playlists (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    username  TEXT NOT NULL,
+    name      TEXT NOT NULL,
+    UNIQUE (username, name)
+);
+
+CREATE TABLE IF NOT EXISTS playlist_songs (
+    playlist_id INTEGER NOT NULL REFERENCES playlists(id) ON DELETE CASCADE,
+    position    INTEGER NOT NULL,
+    music_id    INTEGER NOT NULL,
+    PRIMARY KEY (playlist_id, position)
+);
+CREATE INDEX IF NOT EXISTS playlist_songs_song ON playlist_songs(music_id);
+"""
+
+SONG_COLUMNS = ("MusicID", "Title", "Artist", "Genre", "Duration")
+SONG_UPSERT = (
+    "INSERT OR REPLACE INTO songs "
+    "(music_id, position, title, artist, genre, duration, extra) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+class SQLiteStorage(Storage):
+    """
+    SQLite database with one row per song, user, play and
+    playlist entry. Every save runs in a single transaction and
+    per-user saves only touch that user's rows, so concurrent
+    sessions no longer overwrite each other's files.
+    """
+
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+        return self._conn
+
+    def ensure(self):
+        with self._lock:
+            self._connect().executescript(SQLITE_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ---------------- SONGS ----------------
+
+    @staticmethod
+    def _song_row(pos, song):
+        extra = {k: v for k, v in song.items() if k not in SONG_COLUMNS}
+        return (
+            song["MusicID"], pos, song["Title"], song["Artist"],
+            song["Genre"], song["Duration"], json.dumps(extra) if extra else None
+        )
+
+    def load_songs(self):
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT music_id, title, artist, genre, duration, extra "
+                "FROM songs ORDER BY position"
+            ).fetchall()
+
+        songs = []
+        for mid, t, a, g, d, extra in rows:
+            song = {"MusicID": mid, "Title": t, "Artist": a, "Genre": g, "Duration": d}
+            if extra:
+                song.update(json.loads(extra))
+            songs.append(song)
+        return songs
+
+    def save_songs(self, songs, changed=None):
+        if changed is not None:
+            # append / update only: no rows to delete
+            rows = [self._song_row(pos, songs[pos]) for pos in changed]
+            with self._lock, self._connect() as conn:
+                conn.executemany(SONG_UPSERT, rows)
+            return
+
+        rows = [self._song_row(pos, s) for pos, s in enumerate(songs)]
+        with self._lock, self._connect() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_ids (music_id INTEGER PRIMARY KEY)")
+            conn.execute("DELETE FROM keep_ids")
+            conn.executemany("INSERT OR IGNORE INTO keep_ids VALUES (?)", [(r[0],) for r in rows])
+            conn.execute("DELETE FROM songs WHERE music_id NOT IN (SELECT music_id FROM keep_ids)")
+            conn.executemany(SONG_UPSERT, rows)
+
+    # ---------------- USERS ----------------
+
+    def load_users(self):
+        with self._lock:
+            rows = self._connect().execute("SELECT username, record FROM users").fetchall()
+        return {u: json.loads(r) for u, r in rows}
+
+    def save_users(self, data):
+        with self._lock, self._connect() as conn:
+            existing = {u for (u,) in conn.execute("SELECT username FROM users")}
+            conn.executemany(
+                "DELETE FROM users WHERE username = ?",
+                [(u,) for u in existing - set(data)]
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO users (username, record) VALUES (?, ?)",
+                [(u, json.dumps(r)) for u, r in data.items()]
+            )
+
+    def load_user(self, username):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT record FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_user(self, username, record):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO users (username, record) VALUES (?, ?)",
+                (username, json.dumps(record))
+            )
+
+    # ---------------- PLAYLISTS ----------------
+
+    def load_playlists(self):
+        with self._lock:
+            users = [u for (u,) in self._connect().execute(
+                "SELECT DISTINCT username FROM playlists"
+            )]
+        return {u: self.load_user_playlists(u) for u in users}
+
+    def save_playlists(self, data):
+        with self._lock, self._connect() as conn:
+            existing = {u for (u,) in conn.execute("SELECT DISTINCT username FROM playlists")}
+            for username in existing - set(data):
+                self._write_user_playlists(conn, username, {})
+            for username, playlists in data.items():
+                self._write_user_playlists(conn, username, playlists)
+
+    def load_user_playlists(self, username):
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT p.name, s.music_id FROM playlists p "
+                "LEFT JOIN playlist_songs s ON s.playlist_id = p.id "
+                "WHERE p.username = ? ORDER BY p.id, s.position",
+                (username,)
+            ).fetchall()
+
+        playlists = {}
+        for name, mid in rows:
+            songs = playlists.setdefault(name, [])
+            if mid is not None:
+                songs.append(mid)
+        return playlists
+
+    def save_user_playlists(self, username, playlists):
+        with self._lock, self._connect() as conn:
+            self._write_user_playlists(conn, username, playlists)
+
+    @staticmethod
+    def _write_user_playlists(conn, username, playlists):
+        conn.execute("DELETE FROM playlists WHERE username = ?", (username,))
+        for name, ids in playlists.items():
+            cur = conn.execute(
+                "INSERT INTO playlists (username, name) VALUES (?, ?)", (username, name)
+            )
+            conn.executemany(
+                "INSERT INTO playlist_songs (playlist_id, position, music_id) VALUES (?, ?, ?)",
+                [(cur.lastrowid, pos, mid) for pos, mid in enumerate(ids)]
+            )
+
+    # ---------------- HISTORY ----------------
+
+    @staticmethod
+    def _history_row(username, entry):
+        return (username, entry.get("id"), entry.get("timestamp"), json.dumps(entry))
+
+    def append_history(self, username, entry):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO history (username, music_id, timestamp, entry) VALUES (?, ?, ?, ?)",
+                self._history_row(username, entry)
+            )
+
+    def load_user_history(self, username):
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT entry FROM history WHERE username = ? ORDER BY id", (username,)
+            ).fetchall()
+        return [json.loads(e) for (e,) in rows]
+
+    def save_user_history(self, username, entries):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM history WHERE username = ?", (username,))
+            conn.executemany(
+                "INSERT INTO history (username, music_id, timestamp, entry) VALUES (?, ?, ?, ?)",
+                [self._history_row(username, e) for e in entries]
+            )
+
+    def history_users(self):
+        with self._lock:
+            return [u for (u,) in self._connect().execute(
+                "SELECT DISTINCT username FROM history ORDER BY username"
+            )]
+
+
+# -------------------------------------------------------------
+# ACTIVE BACKEND
+# -------------------------------------------------------------
+
+def make_storage(backend=STORAGE_BACKEND):
+    if backend == "sqlite":
+        return SQLiteStorage()
+    if backend == "json":
+        return JsonStorage()
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+_storage = make_storage()
+_song_listeners = []  # called with the catalog after every save_songs()
+
+
+def get_storage():
+    return _storage
+
+
+def set_storage(storage):
+    """
+    Swap the backend used by the module-level helpers below.
+    """
+    global _storage
+    _storage = storage
+
+
+def ensure_data_structure():
+    """Create necessary folders + files (or tables) if missing."""
+    _storage.ensure()
 
 
 # SONGS ----------------------------------------------------
 
 def load_songs():
-    return load_json(SONG_FILE)
+    return _storage.load_songs()
+
+
+def save_songs(songs, changed=None):
+    _storage.save_songs(songs, changed)
+    for callback in _song_listeners:
+        callback(songs)
 
 
-def save_songs(songs):
-    save_json(SONG_FILE, songs)
+def on_songs_saved(callback):
+    """
+    Register a callback(songs) run after the catalog is saved,
+    e.g. to update indexes derived from it.
+    """
+    _song_listeners.append(callback)
 
 
 # USERS -----------------------------------------------------
 
 def load_users():
-    return load_json(USER_FILE)
+    return _storage.load_users()
 
 
 def save_users(data):
-    save_json(USER_FILE, data)
+    _storage.save_users(data)
+
+
+def load_user(username):
+    return _storage.load_user(username)
+
+
+def save_user(username, record):
+    _storage.save_user(username, record)
 
 
 # HISTORY ---------------------------------------------------
 
+def append_history(username, entry):
+    if username is None:
+        raise ValueError("history entry without a username")
+    _storage.append_history(username, entry)
+
+
+def load_user_history(username):
+    return _storage.load_user_history(username)
+
+
+def save_user_history(username, entries):
+    _storage.save_user_history(username, entries)
+
+
+def compact_history():
+    _storage.compact_history()
+
+
+def history_users():
+    return _storage.history_users()
+
+
 def load_history():
-    return load_json(HISTORY_FILE)
+    return _storage.load_history()
 
 
 def save_history(data):
-    save_json(HISTORY_FILE, data)
+    _storage.save_history(data)
 
 
 # PLAYLISTS -------------------------------------------------
 
 def load_playlists():
-    return load_json(PLAYLIST_FILE)
+    return _storage.load_playlists()
 
 
 def save_playlists(data):
-    save_json(PLAYLIST_FILE, data)
+    _storage.save_playlists(data)
+
+
+def load_user_playlists(username):
+    return _storage.load_user_playlists(username)
+
+
+def save_user_playlists(username, playlists):
+    _storage.save_user_playlists(username, playlists)
+
+
+# CACHE -----------------------------------------------------
+
+def write_batch():
+    """
+    with write_batch(): ... -- JSON files saved inside the block are
+    written once, when it ends.
+    """
+    return JSON_CACHE.batch()
+
+
+def cache_stats():
+    """
+    Hit/miss/write counts and seconds spent parsing JSON files.
+    """
+    return JSON_CACHE.stats()
+
+
+# -------------------------------------------------------------
+# MIGRATION
+# -------------------------------------------------------------
+
+def migrate_json_to_sqlite(data_dir=DATA_DIR, db_path=SQLITE_FILE):
+    """
+    Import every data/*.json file into a SQLite database.
+    """
+    src = JsonStorage(data_dir)
+    src.ensure()
+    src.compact_history()
+
+    dst = SQLiteStorage(db_path)
+    dst.ensure()
+
+    songs = src.load_songs()
+    users = src.load_users()
+    playlists = src.load_playlists()
+    history = src.load_history()
+
+    dst.save_songs(songs)
+    dst.save_users(users)
+    dst.save_playlists(playlists)
+    dst.save_history(history)
+    dst.close()
+
+    return {
+        "songs": len(songs),
+        "users": len(users),
+        "playlists": sum(len(p) for p in playlists.values()),
+        "plays": sum(len(h) for h in history.values()),
+    }
+
+
+def convert_data(fmt, data_dir=DATA_DIR):
+    """
+    Rewrite the songs, user/playlist shards and history snapshots of
+    a JSON data folder in another format. Returns the file count.
+    """
+    if fmt not in DATA_FORMATS:
+        raise ValueError(f"unknown data format: {fmt}")
+    storage = JsonStorage(data_dir)
+    storage.ensure()
+    storage.compact_history()
+
+    paths = [storage.song_file]
+    for folder in (storage.user_dir, storage.playlist_dir, storage.history_dir):
+        paths += [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".json")]
+
+    for path in paths:
+        with file_lock(path):
+            save_json(path, load_json(path), fmt)
+        JSON_CACHE.invalidate(path)
+    return len(paths)
+
+
+def main():
+    """
+    python database.py migrate [data_dir] [db_path]
+    python database.py shard [data_dir]
+    python database.py convert pretty|compact|columnar [data_dir]
+    """
+    if len(sys.argv) < 2 or sys.argv[1] not in ("migrate", "shard", "convert"):
+        print("usage: python database.py migrate [data_dir] [db_path]")
+        print("       python database.py shard [data_dir]")
+        print("       python database.py convert pretty|compact|columnar [data_dir]")
+        sys.exit(1)
+
+    args = sys.argv[2:]
+
+    if sys.argv[1] == "convert":
+        if not args or args[0] not in DATA_FORMATS:
+            print("usage: python database.py convert pretty|compact|columnar [data_dir]")
+            sys.exit(1)
+        folder = args[1] if len(args) > 1 else DATA_DIR
+        count = convert_data(args[0], folder)
+        print(f"Rewrote {count} files in {folder} as {args[0]}")
+        return
+
+    source = args[0] if args else DATA_DIR
+
+    if sys.argv[1] == "shard":
+        storage = JsonStorage(source)
+        os.makedirs(storage.user_dir, exist_ok=True)
+        os.makedirs(storage.playlist_dir, exist_ok=True)
+        counts = storage.migrate_legacy_shards()
+        storage.ensure()  # history.json -> history/ too
+        print(f"Sharded {source}: " + ", ".join(f"{v} {k}" for k, v in counts.items()))
+        return
+
+    target = args[1] if len(args) > 1 else os.path.join(source, "musit.db")
+
+    counts = migrate_json_to_sqlite(source, target)
+    print(f"Imported into {target}: " + ", ".join(f"{v} {k}" for k, v in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
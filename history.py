@@ -0,0 +1,52 @@
+from database import (
+    append_history, load_user_history, save_user_history,
+    compact_history
+)
+
+
+# -------------------------------------------------------------
+# MUSIT 5.0 — PLAY HISTORY STORE
+# -------------------------------------------------------------
+
+
+class HistoryStore:
+    """
+    Dict-like view of every user's play history.
+    A user's plays are read from disk the first time they are
+    needed; new plays go to the append-only log.
+    """
+
+    def __init__(self):
+        self._users = {}
+
+    def _load(self, username):
+        if username not in self._users:
+            self._users[username] = load_user_history(username)
+        return self._users[username]
+
+    def __contains__(self, username):
+        return bool(self._load(username))
+
+    def __getitem__(self, username):
+        return self._load(username)
+
+    def __setitem__(self, username, entries):
+        save_user_history(username, entries)
+        self._users[username] = list(entries)
+
+    def get(self, username, default=None):
+        return self._load(username) if username in self else default
+
+    def append(self, username, entry):
+        """
+        Record one play. Does not load the user's older plays.
+        """
+        append_history(username, entry)
+        if username in self._users:
+            self._users[username].append(entry)
+
+    def flush(self):
+        """
+        Fold pending log records into the per-user snapshots.
+        """
+        compact_history()
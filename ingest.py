@@ -0,0 +1,283 @@
+import os
+import re
+import sys
+import json
+from concurrent.futures import ProcessPoolExecutor
+from database import (
+    DATA_DIR, atomic_write, ensure_data_structure, load_songs, save_songs
+)
+from mp3info import META_CACHE, probe
+
+
+# -------------------------------------------------------------
+# MUSIT 5.0 — LIBRARY INGEST
+# -------------------------------------------------------------
+#
+#   python ingest.py [music_dir]
+#
+# Walks a music folder, reads ID3 tags and the real duration of
+# every MP3 on a process pool and adds them to the catalog. Songs
+# remember their file ("File", relative to music_dir; playback
+# resolves it under mp3/, the default music_dir), and the
+# mtime/size of each ingested file is kept in ingest_state.json,
+# so a re-run only reads new or changed files and an interrupted
+# run picks up after the last saved batch.
+
+INGEST_STATE_FILE = os.path.join(DATA_DIR, "ingest_state.json")
+INGEST_BATCH = 2000  # files per pool round + catalog transaction
+
+# ID3v1 genre numbers (also used as "(17)" in ID3v2 TCON frames)
+ID3V1_GENRES = [
+    "Blues", "Classic Rock", "Country", "Dance", "Disco", "Funk", "Grunge",
+    "Hip-Hop", "Jazz", "Metal", "New Age", "Oldies", "Other", "Pop", "R&B",
+    "Rap", "Reggae", "Rock", "Techno", "Industrial", "Alternative", "Ska",
+    "Death Metal", "Pranks", "Soundtrack", "Euro-Techno", "Ambient",
+    "Trip-Hop", "Vocal", "Jazz+Funk", "Fusion", "Trance", "Classical",
+    "Instrumental", "Acid", "House", "Game", "Sound Clip", "Gospel", "Noise",
+    "AlternRock", "Bass", "Soul", "Punk", "Space", "Meditative",
+    "Instrumental Pop", "Instrumental Rock", "Ethnic", "Gothic", "Darkwave",
+    "Techno-Industrial", "Electronic", "Pop-Folk", "Eurodance", "Dream",
+    "Southern Rock", "Comedy", "Cult", "Gangsta", "Top 40", "Christian Rap",
+    "Pop/Funk", "Jungle", "Native American", "Cabaret", "New Wave",
+    "Psychadelic", "Rave", "Showtunes", "Trailer", "Lo-Fi", "Tribal",
+    "Acid Punk", "Acid Jazz", "Polka", "Retro", "Musical", "Rock & Roll",
+    "Hard Rock",
+]
+
+TAG_FRAMES = {
+    "TIT2": "Title", "TPE1": "Artist", "TCON": "Genre",
+    "TT2": "Title", "TP1": "Artist", "TCO": "Genre",   # ID3v2.2
+}
+
+TEXT_ENCODINGS = ("latin-1", "utf-16", "utf-16-be", "utf-8")
+
+
+# -------------------- ID3 TAGS --------------------------------
+
+def _text_frame(body):
+    if not body:
+        return ""
+    encoding = TEXT_ENCODINGS[body[0]] if body[0] < 4 else "latin-1"
+    text = body[1:].decode(encoding, errors="replace")
+    # v2.4 separates multiple values with NULs: keep the first
+    return text.split("\0")[0].strip()
+
+
+def read_id3v2(f):
+    """
+    Title/Artist/Genre from an ID3v2.2-2.4 tag at the start of f.
+    """
+    head = f.read(10)
+    if len(head) < 10 or head[:3] != b"ID3":
+        return {}
+
+    major, flags = head[3], head[5]
+    size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+    data = f.read(size)
+
+    pos = 0
+    if flags & 0x40 and major >= 3:   # extended header
+        ext = int.from_bytes(data[:4], "big")
+        pos = ext if major == 4 else ext + 4
+
+    id_len, hdr_len = (3, 6) if major == 2 else (4, 10)
+    tags = {}
+    while pos + hdr_len <= len(data) and data[pos] != 0:
+        frame_id = data[pos:pos + id_len].decode("latin-1")
+        raw = data[pos + id_len:pos + id_len * 2]
+        if major == 4:
+            length = (raw[0] << 21) | (raw[1] << 14) | (raw[2] << 7) | raw[3]
+        else:
+            length = int.from_bytes(raw, "big")
+
+        body = data[pos + hdr_len:pos + hdr_len + length]
+        key = TAG_FRAMES.get(frame_id)
+        if key and key not in tags:
+            tags[key] = _text_frame(body)
+        pos += hdr_len + length
+
+    return {k: v for k, v in tags.items() if v}
+
+
+def read_id3v1(f):
+    """
+    Title/Artist/Genre from a 128-byte ID3v1 tag at the end of f.
+    """
+    try:
+        f.seek(-128, os.SEEK_END)
+    except OSError:
+        return {}
+    data = f.read(128)
+    if data[:3] != b"TAG":
+        return {}
+
+    def field(a, b):
+        return data[a:b].split(b"\0")[0].decode("latin-1").strip()
+
+    tags = {"Title": field(3, 33), "Artist": field(33, 63)}
+    if data[127] < len(ID3V1_GENRES):
+        tags["Genre"] = ID3V1_GENRES[data[127]]
+    return {k: v for k, v in tags.items() if v}
+
+
+def clean_genre(genre):
+    """
+    "(17)" -> "Rock", "(17)Indie Rock" -> "Indie Rock", "17" -> "Rock"
+    """
+    m = re.fullmatch(r"\((\d+)\)(.*)", genre) or re.fullmatch(r"(\d+)()", genre)
+    if not m:
+        return genre
+    if m.group(2):
+        return m.group(2).strip()
+    n = int(m.group(1))
+    return ID3V1_GENRES[n] if n < len(ID3V1_GENRES) else "Unknown"
+
+
+def read_tags(path):
+    """
+    Song fields for one file: ID3v2, then ID3v1, then the file name.
+    """
+    with open(path, "rb") as f:
+        tags = read_id3v2(f)
+        if len(tags) < 3:
+            for k, v in read_id3v1(f).items():
+                tags.setdefault(k, v)
+
+    tags.setdefault("Title", os.path.splitext(os.path.basename(path))[0])
+    tags.setdefault("Artist", "Unknown")
+    tags["Genre"] = clean_genre(tags.get("Genre", "Unknown"))
+    return tags
+
+
+def _read_job(path):
+    """
+    Pool worker: (path, (mtime, size), tags, probe info) or Nones.
+    """
+    try:
+        st = os.stat(path)
+        return path, (st.st_mtime_ns, st.st_size), read_tags(path), probe(path)
+    except (OSError, ValueError, IndexError):
+        return path, None, None, None
+
+
+# -------------------- INGEST ----------------------------------
+
+def _load_state(path):
+    try:
+        with open(path, "r", encoding="utf8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(path, state):
+    atomic_write(path, json.dumps(state, separators=(",", ":")))
+
+
+def scan(music_dir, state):
+    """
+    Files under music_dir that are new or changed since the last run,
+    as (relative path, absolute path) pairs.
+    """
+    todo = []
+    for root, _, files in os.walk(music_dir):
+        for name in files:
+            if not name.lower().endswith(".mp3"):
+                continue
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, music_dir).replace(os.sep, "/")
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if state.get(rel) != [st.st_mtime_ns, st.st_size]:
+                todo.append((rel, path))
+    todo.sort()
+    return todo
+
+
+def ingest(music_dir="mp3", workers=None, batch=INGEST_BATCH,
+           state_file=INGEST_STATE_FILE, progress=None):
+    """
+    Add new MP3s under music_dir to the catalog and refresh changed
+    ones. Each batch is saved (songs, then state) before the next
+    starts. Returns {"added": n, "updated": n, "skipped": n}.
+    """
+    ensure_data_structure()
+    songs = load_songs()
+    state = _load_state(state_file)
+
+    by_file = {}
+    by_name = {}
+    for pos, s in enumerate(songs):
+        if "File" in s:
+            by_file[s["File"]] = pos
+        else:
+            # hand-curated entries get linked to their file, not duplicated
+            by_name.setdefault((s["Title"].lower(), s["Artist"].lower()), pos)
+    next_id = max((s["MusicID"] for s in songs), default=0) + 1
+
+    todo = scan(music_dir, state)
+    counts = {"added": 0, "updated": 0, "skipped": 0}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(todo), batch):
+            chunk = todo[start:start + batch]
+            paths = [path for _, path in chunk]
+            changed = []
+
+            for (rel, _), (path, stamp, tags, info) in zip(
+                    chunk, pool.map(_read_job, paths, chunksize=64)):
+                if stamp is None:
+                    counts["skipped"] += 1
+                    continue
+                if info is None:
+                    # not an MPEG stream: remember it so re-runs skip it
+                    state[rel] = list(stamp)
+                    counts["skipped"] += 1
+                    continue
+
+                META_CACHE.store(path, info, stamp)
+                fields = {
+                    "Title": tags["Title"], "Artist": tags["Artist"],
+                    "Genre": tags["Genre"], "Duration": round(info["duration"]),
+                    "File": rel,
+                }
+
+                pos = by_file.get(rel)
+                if pos is None:
+                    pos = by_name.pop((tags["Title"].lower(), tags["Artist"].lower()), None)
+                if pos is None:
+                    songs.append({"MusicID": next_id, **fields})
+                    pos = len(songs) - 1
+                    next_id += 1
+                    counts["added"] += 1
+                else:
+                    songs[pos].update(fields)
+                    counts["updated"] += 1
+
+                by_file[rel] = pos
+                state[rel] = list(stamp)
+                changed.append(pos)
+
+            # songs first: a crash before the state write only means
+            # the batch is read again and matched by "File" next run
+            save_songs(songs, changed=changed)
+            _save_state(state_file, state)
+            META_CACHE.save()
+
+            if progress:
+                progress(min(start + batch, len(todo)), len(todo))
+
+    return counts
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else "mp3"
+
+    def report(done, total):
+        print(f"\r  {done}/{total} files", end="", flush=True)
+
+    result = ingest(folder, progress=report)
+    print()
+    print("Ingest done: " + ", ".join(f"{v} {k}" for k, v in result.items()))
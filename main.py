@@ -15,19 +15,25 @@ from ui import (
 
 from ai import (
     fuzzy_search, recommend_ai, recommend_by_mood,
-    similar_songs, predict_next
+    similar_songs, predict_next, open_similarity_index
 )
 
 from audio import (
     play_audio, stop_audio, pause_audio,
-    resume_audio, match_mp3
+    resume_audio, song_mp3, song_mp3_bulk, prefetch,
+    now_playing, on_advance, ENGINE
 )
 
 from database import (
     ensure_data_structure, load_songs, save_songs,
-    load_history, save_history, load_users
+    load_user, on_songs_saved, write_batch, WriteConflict, SIMILAR_INDEX_FILE
 )
 
+from history import HistoryStore
+from taste import TasteStore
+from collab import open_cooccurrence
+from markov import open_transition_model
+
 from playlists import (
     print_playlists, create_playlist, delete_playlist,
     rename_playlist, add_to_playlist, remove_from_playlist,
@@ -39,8 +45,11 @@ from users import (
     is_admin, change_password
 )
 
+from catalog import make_catalog
+
 from utils import (
-    find_song, find_song_by_title, input_int,
+    find_song, find_song_by_title, find_songs_by_artist,
+    find_songs_by_genre, autocomplete, input_int,
     sort_songs_by_artist, sort_songs_by_title,
     sort_songs_by_duration, hr_song, normalize_mood
 )
@@ -55,9 +64,19 @@ ensure_data_structure()
 # ensure admin user exists
 ensure_admin_exists()
 
-# Load songs and history from JSON
-SONGS = load_songs()
-HISTORY = load_history()
+# Load songs from JSON; history is loaded lazily per user
+SONGS = make_catalog(load_songs())  # MUSIT_CATALOG=columnar for the compact layout
+SONGS_SAVED = SONGS.version  # catalog version last written to disk
+HISTORY = HistoryStore()
+TASTE = TasteStore()  # running per-user taste counters for the AI
+COLLAB = open_cooccurrence()  # "listeners also played" across all users
+MARKOV = open_transition_model()  # what listeners actually played next
+
+# Precomputed similar-song neighbours (None without NumPy), synced in the
+# background; similar_songs() scans the catalog until it is ready
+SIMILAR_INDEX = open_similarity_index(SONGS, SIMILAR_INDEX_FILE)
+if SIMILAR_INDEX is not None:
+    on_songs_saved(SIMILAR_INDEX.refresh)
 
 # Current session
 CURRENT_USER = None  # username string
@@ -66,8 +85,22 @@ CURRENT_SONG = None  # last played song dict
 
 def save_all():
     """Save all persistent data."""
-    save_songs(SONGS)
-    save_history(HISTORY)
+    global SONGS_SAVED
+
+    version = SONGS.version
+    try:
+        with write_batch():
+            # unchanged songs aren't written back over what ingest or
+            # another session may have added since
+            if version != SONGS_SAVED:
+                save_songs(SONGS)
+            TASTE.flush()  # one users.json write for every changed profile
+        SONGS_SAVED = version
+    except WriteConflict as e:
+        box(f"Song library not saved: {e}")
+    HISTORY.flush()
+    COLLAB.save()
+    MARKOV.save()
 
 # -------------------------------------------------------------
 # main.py - Part 2/9
@@ -118,7 +151,12 @@ def login_flow():
 
 def logout_flow():
     """Logs out the current user and returns to welcome menu."""
-    global CURRENT_USER
+    global CURRENT_USER, QUEUED
+    stop_audio()  # nothing may auto-advance into the next user's history
+    QUEUED = None
+    TASTE.flush()
+    COLLAB.save()
+    MARKOV.save()
     CURRENT_USER = None
     banner(" LOGGED OUT ")
     time.sleep(1)
@@ -261,6 +299,7 @@ def search_menu():
                 "Search by Artist",
                 "Search by Genre",
                 "Fuzzy Search (Smart)",
+                "Autocomplete (Prefix)",
                 "Back"
             ]
         )
@@ -276,13 +315,13 @@ def search_menu():
             print_song_table([song] if song else [])
 
         elif choice == 3:
-            artist = prompt("Enter Artist").lower()
-            results = [s for s in SONGS if artist in s["Artist"].lower()]
+            artist = prompt("Enter Artist")
+            results = find_songs_by_artist(SONGS, artist)
             print_song_table(results)
 
         elif choice == 4:
-            genre = prompt("Enter Genre").lower()
-            results = [s for s in SONGS if genre in s["Genre"].lower()]
+            genre = prompt("Enter Genre")
+            results = find_songs_by_genre(SONGS, genre)
             print_song_table(results)
 
         elif choice == 5:
@@ -291,20 +330,40 @@ def search_menu():
             print_song_table(results)
 
         elif choice == 6:
+            autocomplete_menu()
+
+        elif choice == 7:
             return
 
         else:
             box("Invalid option.")
 
+def autocomplete_menu():
+    """Refine a title/artist prefix until Enter is pressed on an empty line."""
+    prefix = ""
+
+    while True:
+        typed = input(f"\nPrefix (Enter to finish) > {prefix}")
+        if not typed:
+            return
+
+        prefix += typed
+        completions, results = autocomplete(SONGS, prefix)
+
+        if completions:
+            print("  " + " | ".join(completions))
+        print_song_table(results)
+
 # -------------------------------------------------------------
 # main.py - Part 5/9
 # PLAY SONG + AUDIO CONTROLS + HISTORY LOGGING
 # -------------------------------------------------------------
 
-def log_play(song):
-    """Store song play into HISTORY JSON."""
+def log_play(song, playlist=None, user=None):
+    """Append song play to the HISTORY log (of user, default: logged in)."""
     global HISTORY
 
+    user = user or CURRENT_USER
     entry = {
         "id": song["MusicID"],
         "title": song["Title"],
@@ -312,26 +371,78 @@ def log_play(song):
         "genre": song["Genre"],
         "duration": song["Duration"],
         "timestamp": time.time(),
-        "user": CURRENT_USER
+        "user": user
     }
 
-    # Append to history
-    if CURRENT_USER not in HISTORY:
-        HISTORY[CURRENT_USER] = []
+    # Append to history (one log record, no full rewrite)
+    HISTORY.append(user, entry)
+    TASTE.record(user, entry, HISTORY[user])
+    COLLAB.record(HISTORY[user])
+    MARKOV.record(HISTORY[user])
+
+    # Get the likely next tracks ready while this one plays
+    prefetch_next(song, playlist, user)
+
+
+UP_NEXT = None  # (MusicID it follows, AI pick), prepared in the background
+QUEUED = None   # (filename, song, playlist, user) the engine plays after this track
+
+
+def prefetch_next(song, playlist=None, user=None):
+    """
+    Pick the next track on the prefetch worker: the next playlist
+    entry, else the AI pick. Only that one is decoded and queued, so
+    it follows the current track without a gap.
+    """
+    user = user or CURRENT_USER
+
+    def job():
+        global UP_NEXT, QUEUED
+        history = HISTORY[user]
+        pick = predict_next(SONGS, history, index=SIMILAR_INDEX,
+                            profile=TASTE.get(user, history), collab=COLLAB,
+                            markov=MARKOV)
+        UP_NEXT = (song["MusicID"], pick)
+
+        # playlist order first: the next entry is the surest bet
+        following = None
+        if playlist and song["MusicID"] in playlist:
+            pos = playlist.index(song["MusicID"])
+            following = find_song(SONGS, playlist[(pos + 1) % len(playlist)])
+        if following is None:
+            following, playlist_next = pick, None
+        else:
+            playlist_next = playlist
 
-    HISTORY[CURRENT_USER].append(entry)
-    save_history(HISTORY)
+        mp3 = song_mp3(following) if following else None
+        if user != CURRENT_USER:
+            mp3 = None  # logged out meanwhile: queue nothing
+        QUEUED = (mp3, following, playlist_next, user) if mp3 else None
+        return mp3
+
+    prefetch(job)
+
+
+def play_queued(filename):
+    """The engine moved on to the queued track: log it like a menu play."""
+    global CURRENT_SONG
+    queued = QUEUED
+    if queued and queued[0] == filename:
+        CURRENT_SONG = queued[1]
+        log_play(queued[1], queued[2], queued[3])
+
+
+on_advance(play_queued)
 
 
 # ------------------- PLAY SONG MENU ----------------------------
 
 CURRENT_SONG = None  # last played song object
-AUDIO_PAUSED = False
 
 
 def play_song_menu():
     """Select a song by ID and play it."""
-    global CURRENT_SONG, AUDIO_PAUSED
+    global CURRENT_SONG
 
     sid = input_int("Enter Music ID: ")
     if sid is None:
@@ -349,7 +460,7 @@ def play_song_menu():
     log_play(song)
 
     # Try to find corresponding MP3 file
-    mp3_file = match_mp3(song["Title"])
+    mp3_file = song_mp3(song)
     cover_path = f"assets/{song['Genre'].lower()}.txt"  # optional genre-based covers
 
     # If no MP3, still show visual playback
@@ -377,8 +488,8 @@ def play_song_menu():
 # ------------------- AFTER-PLAY OPTIONS -------------------------
 
 def post_play_options():
-    """After finishing a song playback, ask user what to do next."""
-    global CURRENT_SONG, AUDIO_PAUSED
+    """After the playback screen, ask user what to do next."""
+    global CURRENT_SONG, UP_NEXT
 
     while True:
         choice = menu(
@@ -389,19 +500,24 @@ def post_play_options():
                 "Stop",
                 "Play Similar Song",
                 "AI Auto-Recommended Next Song",
+                "Now Playing",
                 "Back"
             ]
         )
 
+        # [p] on the playback screen pauses too: ask the engine
+        status = ENGINE.snapshot()["status"]
+
         if choice == 1:   # pause
-            pause_audio()
-            AUDIO_PAUSED = True
-            box("Paused.")
+            if status == "playing":
+                pause_audio()
+                box("Paused.")
+            else:
+                box("Audio is not playing.")
 
         elif choice == 2: # resume
-            if AUDIO_PAUSED:
+            if status == "paused":
                 resume_audio()
-                AUDIO_PAUSED = False
                 box("Resumed.")
             else:
                 box("Audio is not paused.")
@@ -413,7 +529,7 @@ def post_play_options():
 
         elif choice == 4: # similar song
             if CURRENT_SONG:
-                similar = similar_songs(CURRENT_SONG, SONGS, top_n=3)
+                similar = similar_songs(CURRENT_SONG, SONGS, top_n=3, index=SIMILAR_INDEX)
                 if similar:
                     print_song_table(similar)
                     sid = input_int("Play which song ID?")
@@ -424,14 +540,24 @@ def post_play_options():
 
         elif choice == 5: # AI autoplay
             if CURRENT_USER in HISTORY:
-                next_song = predict_next(SONGS, HISTORY[CURRENT_USER])
+                history = HISTORY[CURRENT_USER]
+
+                # use the pick the prefetcher already decoded, if it is current
+                if UP_NEXT and UP_NEXT[0] == history[-1]["id"]:
+                    next_song = UP_NEXT[1]
+                else:
+                    next_song = predict_next(SONGS, history, index=SIMILAR_INDEX,
+                                             profile=TASTE.get(CURRENT_USER, history),
+                                             collab=COLLAB, markov=MARKOV)
+                UP_NEXT = None
+
                 if next_song:
                     box("Next song (AI Auto-play):")
                     print_song_table([next_song])
                     time.sleep(1)
                     # autoplay
                     log_play(next_song)
-                    mp3_file = match_mp3(next_song["Title"])
+                    mp3_file = song_mp3(next_song)
                     if mp3_file:
                         play_audio(mp3_file, duration=next_song["Duration"])
                     else:
@@ -445,6 +571,9 @@ def post_play_options():
                 box("No history found.")
 
         elif choice == 6:
+            now_playing()
+
+        elif choice == 7:
             return
 
         else:
@@ -465,7 +594,8 @@ def ai_recommendation_menu():
         box("Listen to at least 5 songs first.")
         return
 
-    recommended = recommend_ai(SONGS, HISTORY[CURRENT_USER])
+    history = HISTORY[CURRENT_USER]
+    recommended = recommend_ai(SONGS, history, TASTE.get(CURRENT_USER, history))
 
     if not recommended:
         box("AI could not find a good recommendation.")
@@ -478,7 +608,7 @@ def ai_recommendation_menu():
     play = prompt("Play this song? (y/n)").lower()
     if play == "y":
         log_play(recommended)
-        mp3 = match_mp3(recommended["Title"])
+        mp3 = song_mp3(recommended)
         cover = f"assets/{recommended['Genre'].lower()}.txt"
         play_audio(mp3, duration=recommended["Duration"], cover_path=cover) if mp3 \
             else box("MP3 missing → waveform only.")
@@ -514,7 +644,7 @@ def mood_recommendation_menu():
         song = find_song(SONGS, sid)
         if song:
             log_play(song)
-            mp3 = match_mp3(song["Title"])
+            mp3 = song_mp3(song)
             cover = f"assets/{song['Genre'].lower()}.txt"
             play_audio(mp3, duration=song["Duration"], cover_path=cover) if mp3 \
                 else box("MP3 missing → waveform only.")
@@ -536,7 +666,7 @@ def similar_song_menu():
 
     banner(f" SIMILAR SONGS TO: {CURRENT_SONG['Title']} ")
 
-    results = similar_songs(CURRENT_SONG, SONGS, top_n=5)
+    results = similar_songs(CURRENT_SONG, SONGS, top_n=5, index=SIMILAR_INDEX)
 
     if not results:
         box("No similar songs found.")
@@ -554,7 +684,7 @@ def similar_song_menu():
         song = find_song(SONGS, sid)
         if song:
             log_play(song)
-            mp3 = match_mp3(song["Title"])
+            mp3 = song_mp3(song)
             cover = f"assets/{song['Genre'].lower()}.txt"
             play_audio(mp3, duration=song["Duration"], cover_path=cover) if mp3 \
                 else box("MP3 missing → waveform only.")
@@ -648,7 +778,8 @@ def play_from_playlist():
         return
 
     # Show playlist songs
-    songs_in_pl = [find_song(SONGS, sid) for sid in playlists[name] if find_song(SONGS, sid)]
+    songs_in_pl = [s for s in (find_song(SONGS, sid) for sid in playlists[name]) if s]
+    mp3_files = song_mp3_bulk(songs_in_pl)
 
     print_song_table(songs_in_pl)
 
@@ -657,9 +788,9 @@ def play_from_playlist():
 
     if song:
         CURRENT_SONG = song
-        log_play(song)
+        log_play(song, playlists[name])
 
-        mp3 = match_mp3(song["Title"])
+        mp3 = mp3_files.get(song["MusicID"]) or song_mp3(song)
         cover = f"assets/{song['Genre'].lower()}.txt"
 
         play_audio(mp3, duration=song["Duration"], cover_path=cover) if mp3 \
@@ -726,7 +857,8 @@ def play_from_playlist_favorites():
         box("Favorites is empty.")
         return
 
-    songs_in_fav = [find_song(SONGS, sid) for sid in fav if find_song(SONGS, sid)]
+    songs_in_fav = [s for s in (find_song(SONGS, sid) for sid in fav) if s]
+    mp3_files = song_mp3_bulk(songs_in_fav)
     print_song_table(songs_in_fav)
 
     sid = input_int("Enter ID to play:")
@@ -734,8 +866,8 @@ def play_from_playlist_favorites():
 
     if song:
         CURRENT_SONG = song
-        log_play(song)
-        mp3 = match_mp3(song["Title"])
+        log_play(song, fav)
+        mp3 = mp3_files.get(song["MusicID"]) or song_mp3(song)
         cover = f"assets/{song['Genre'].lower()}.txt"
         play_audio(mp3, duration=song["Duration"], cover_path=cover) if mp3 \
             else box("MP3 missing → waveform only.")
@@ -788,7 +920,7 @@ def history_menu():
         song = find_song(SONGS, sid)
         if song:
             log_play(song)
-            mp3 = match_mp3(song["Title"])
+            mp3 = song_mp3(song)
             cover = f"assets/{song['Genre'].lower()}.txt"
             play_audio(mp3, duration=song["Duration"], cover_path=cover) if mp3 \
                 else box("MP3 missing → waveform only.")
@@ -814,7 +946,6 @@ def clear_history():
         return
 
     HISTORY[CURRENT_USER] = []
-    save_history(HISTORY)
     box("History cleared.")
 
 
@@ -852,8 +983,7 @@ def view_user_info():
     """Display detailed info about current user."""
     banner(" USER INFORMATION ")
 
-    users = load_users()
-    user = users.get(CURRENT_USER, None)
+    user = load_user(CURRENT_USER)
 
     if not user:
         box("User not found.")
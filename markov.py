@@ -0,0 +1,218 @@
+import os
+import json
+import random
+import threading
+from database import DATA_DIR, atomic_write, file_lock, load_history
+
+
+# -------------------------------------------------------------
+# MUSIT 5.0 — MARKOV NEXT-TRACK MODEL
+# -------------------------------------------------------------
+#
+# Counts of which song followed which (and which pair) in every
+# user's history. Sampling the next track is O(1) through a Walker
+# alias table per state, rebuilt only when that state's counts change.
+
+TRANSITIONS_FILE = os.path.join(DATA_DIR, "transitions.json")
+
+MARKOV_MIN_COUNT = 3         # transitions seen before a state is trusted
+MARKOV_SESSION_GAP = 3600    # seconds; a longer pause is not a transition
+
+
+def alias_table(weights):
+    """
+    Vose's alias method: (prob, alias) lists for drawing index i
+    with probability weights[i] / sum(weights) in O(1).
+    """
+    n = len(weights)
+    total = sum(weights)
+    scaled = [w * n / total for w in weights]
+    prob = [1.0] * n
+    alias = list(range(n))
+
+    small = [i for i, p in enumerate(scaled) if p < 1]
+    large = [i for i, p in enumerate(scaled) if p >= 1]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] -= 1 - scaled[s]
+        (small if scaled[l] < 1 else large).append(l)
+
+    return prob, alias
+
+
+class TransitionModel:
+    """
+    First- and second-order transition counts:
+      first[a][b]       songs played right after a
+      second[(a, b)][c] songs played right after a then b
+    sample() uses the second-order state when it has enough data,
+    then the first-order one, and returns None for a cold start.
+    """
+
+    def __init__(self, path=TRANSITIONS_FILE):
+        self.path = path
+        self.first = {}
+        self.second = {}
+        self.tables = {}   # (order, state) -> (next ids, prob, alias, total)
+        self.pending = []  # (entry, previous) recorded since the last load/save
+        self.lock = threading.Lock()
+        self.dirty = False
+
+    # ---------------- UPDATES ----------------
+
+    def _add(self, entry, previous):
+        """
+        Count entry as following previous[-1] (and previous[-2]).
+        """
+        if not previous:
+            return
+        prev = previous[-1]
+        t, pt = entry.get("timestamp"), prev.get("timestamp")
+        if t and pt and t - pt > MARKOV_SESSION_GAP:
+            return
+
+        a, b = prev["id"], entry["id"]
+        if a == b:
+            return  # replays say nothing about what comes next
+        row = self.first.setdefault(a, {})
+        row[b] = row.get(b, 0) + 1
+        self.tables.pop((1, a), None)
+
+        if len(previous) > 1:
+            before = previous[-2]
+            ppt = before.get("timestamp")
+            if not (pt and ppt and pt - ppt > MARKOV_SESSION_GAP):
+                state = (before["id"], a)
+                row = self.second.setdefault(state, {})
+                row[b] = row.get(b, 0) + 1
+                self.tables.pop((2, state), None)
+
+    def record(self, history):
+        """
+        Learn the transition into the newest entry of a user's history.
+        """
+        with self.lock:
+            entry, previous = history[-1], history[-3:-1]
+            self._add(entry, previous)
+            if self.pending is not None:
+                self.pending.append((entry, previous))
+            self.dirty = True
+
+    def build(self, histories):
+        """
+        Rebuild from every user's full history.
+        """
+        with self.lock:
+            self.first, self.second, self.tables = {}, {}, {}
+            for history in histories.values():
+                for i in range(1, len(history)):
+                    self._add(history[i], history[max(0, i - 2):i])
+            self.pending = None  # the whole model replaces what is saved
+            self.dirty = True
+
+    # ---------------- SAMPLING ----------------
+
+    def _table(self, order, state, row):
+        key = (order, state)
+        table = self.tables.get(key)
+        if table is None:
+            ids = list(row)
+            weights = [row[i] for i in ids]
+            table = (ids,) + alias_table(weights) + (sum(weights),)
+            self.tables[key] = table
+        return table
+
+    def sample(self, history, rng=random):
+        """
+        Draw the MusicID to play after history, or None if the model
+        hasn't seen enough of this state yet.
+        """
+        if not history:
+            return None
+
+        states = []
+        if len(history) > 1:
+            states.append((2, (history[-2]["id"], history[-1]["id"]), self.second))
+        states.append((1, history[-1]["id"], self.first))
+
+        with self.lock:
+            for order, state, counts in states:
+                row = counts.get(state)
+                if not row:
+                    continue
+                ids, prob, alias, total = self._table(order, state, row)
+                if total >= MARKOV_MIN_COUNT:
+                    i = rng.randrange(len(ids))
+                    return ids[i] if rng.random() < prob[i] else ids[alias[i]]
+        return None
+
+    # ---------------- PERSISTENCE ----------------
+
+    def save(self):
+        """
+        Write the tables. Transitions recorded since the last load are
+        added to the counts on disk (under file_lock), so sessions
+        running side by side don't overwrite each other's.
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+            with file_lock(self.path):
+                if self.pending:
+                    data = self._read()
+                    if data is not None:
+                        self._apply(data)
+                        for entry, previous in self.pending:
+                            self._add(entry, previous)
+                data = {
+                    "first": {a: row for a, row in self.first.items()},
+                    "second": {f"{a},{b}": row for (a, b), row in self.second.items()},
+                }
+                atomic_write(self.path, json.dumps(data, separators=(",", ":")))
+            self.pending = []
+            self.dirty = False
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _apply(self, data):
+        def ints(row):
+            return {int(k): v for k, v in row.items()}
+
+        self.first = {int(a): ints(row) for a, row in data["first"].items()}
+        self.second = {
+            tuple(int(x) for x in state.split(",")): ints(row)
+            for state, row in data["second"].items()
+        }
+        self.tables = {}
+
+    def load(self):
+        """
+        Read the saved tables. Returns False if there are none.
+        """
+        data = self._read()
+        if data is None:
+            return False
+
+        with self.lock:
+            self._apply(data)
+            self.pending = []
+            self.dirty = False
+        return True
+
+
+def open_transition_model(path=TRANSITIONS_FILE):
+    """
+    The saved model, or one learned from all stored history.
+    """
+    model = TransitionModel(path)
+    if not model.load():
+        model.build(load_history())
+        model.save()
+    return model
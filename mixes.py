@@ -0,0 +1,46 @@
+import sys
+import time
+from ai import batch_recommend
+from database import (
+    ensure_data_structure, load_songs, load_history,
+    load_users, save_users
+)
+
+
+# -------------------------------------------------------------
+# MUSIT 5.0 — DAILY MIXES
+# -------------------------------------------------------------
+#
+#   python mixes.py [top_n]
+#
+# Nightly job: scores every user against the catalog in one batch
+# and stores each user's top picks as "daily_mix" in their record.
+
+DAILY_MIX_SIZE = 20
+
+
+def generate_daily_mixes(top_n=DAILY_MIX_SIZE, workers=None):
+    """
+    Compute and save every user's daily mix. Returns the user count.
+    """
+    ensure_data_structure()
+    mixes = batch_recommend(load_songs(), load_history(), top_n, workers)
+
+    # one write for all users instead of one per user
+    users = load_users()
+    created = time.time()
+    for username, picks in mixes.items():
+        if username in users:
+            users[username]["daily_mix"] = {
+                "created": created,
+                "songs": [s["MusicID"] for s in picks],
+            }
+    save_users(users)
+    return len(mixes)
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else DAILY_MIX_SIZE
+    start = time.time()
+    count = generate_daily_mixes(size)
+    print(f"Daily mixes for {count} users in {time.time() - start:.1f}s")
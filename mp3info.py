@@ -0,0 +1,316 @@
+import os
+import sys
+import json
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from database import DATA_DIR, atomic_write
+
+
+# -------------------------------------------------------------
+# MUSIT 5.0 — MP3 METADATA PROBE
+# -------------------------------------------------------------
+#
+# Reads duration, bitrate and sample rate from MPEG audio frame
+# headers without decoding any audio: the Xing/Info or VBRI header
+# when the encoder wrote one, otherwise a scan over frame headers.
+
+META_CACHE_FILE = os.path.join(DATA_DIR, "mp3_meta.json")
+PROBE_BYTES = 64 * 1024  # read past the tag before falling back to a full scan
+
+# kbps by [version is MPEG1][layer]; index 0 = free, 15 = bad
+BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# Hz by version bits (3 = MPEG1, 2 = MPEG2, 0 = MPEG2.5)
+SAMPLE_RATES = {
+    3: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    0: [11025, 12000, 8000],
+}
+
+
+# -------------------- FRAME HEADERS ---------------------------
+
+def parse_header(b):
+    """
+    Decode a 4-byte MPEG audio frame header, or None if invalid.
+    """
+    if len(b) < 4 or b[0] != 0xFF or (b[1] & 0xE0) != 0xE0:
+        return None
+
+    version = (b[1] >> 3) & 3
+    layer = 4 - ((b[1] >> 1) & 3)
+    br_index = b[2] >> 4
+    sr_index = (b[2] >> 2) & 3
+
+    if version == 1 or layer == 4 or br_index in (0, 15) or sr_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = BITRATES[(mpeg1, layer)][br_index] * 1000
+    sample_rate = SAMPLE_RATES[version][sr_index]
+    padding = (b[2] >> 1) & 1
+    channels = 1 if (b[3] >> 6) == 3 else 2
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or mpeg1) else 576
+        length = (samples // 8) * bitrate // sample_rate + padding
+
+    return {
+        "mpeg1": mpeg1, "layer": layer, "bitrate": bitrate,
+        "sample_rate": sample_rate, "channels": channels,
+        "samples": samples, "length": length,
+    }
+
+
+def _skip_id3v2(data):
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _first_frame(data, pos):
+    """
+    First offset from pos where two consecutive valid headers line up.
+    """
+    end = len(data) - 4
+    while pos < end:
+        pos = data.find(b"\xff", pos, end)
+        if pos < 0:
+            return None, None
+        header = parse_header(data[pos:pos + 4])
+        if header and header["length"] > 0:
+            nxt = pos + header["length"]
+            if nxt + 4 > len(data) or parse_header(data[nxt:nxt + 4]):
+                return pos, header
+        pos += 1
+    return None, None
+
+
+def _vbr_header(data, pos, header):
+    """
+    (frames, bytes) from a Xing/Info or VBRI header, if present.
+    """
+    if header["mpeg1"]:
+        side = 17 if header["channels"] == 1 else 32
+    else:
+        side = 9 if header["channels"] == 1 else 17
+
+    xing = pos + 4 + side
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = int.from_bytes(data[xing + 4:xing + 8], "big")
+        at = xing + 8
+        frames = nbytes = None
+        if flags & 1:
+            frames = int.from_bytes(data[at:at + 4], "big")
+            at += 4
+        if flags & 2:
+            nbytes = int.from_bytes(data[at:at + 4], "big")
+        return frames, nbytes
+
+    vbri = pos + 36
+    if data[vbri:vbri + 4] == b"VBRI":
+        nbytes = int.from_bytes(data[vbri + 10:vbri + 14], "big")
+        frames = int.from_bytes(data[vbri + 14:vbri + 18], "big")
+        return frames, nbytes
+
+    return None, None
+
+
+# -------------------- PROBE -----------------------------------
+
+def probe(path):
+    """
+    Duration (s), average bitrate (bps), sample rate and channels of
+    an MP3 file, read from headers only. None if no frames are found.
+    """
+    with open(path, "rb") as f:
+        f.seek(_skip_id3v2(f.read(10)))
+        data = f.read(PROBE_BYTES)
+        pos, header = _first_frame(data, 0)
+        if header is None:
+            return None
+
+        frames, nbytes = _vbr_header(data, pos, header)
+        if not frames:
+            data += f.read()
+
+    rate = header["sample_rate"]
+    info = {"sample_rate": rate, "channels": header["channels"]}
+
+    if frames:
+        duration = frames * header["samples"] / rate
+        info["duration"] = duration
+        info["bitrate"] = round(nbytes * 8 / duration) if nbytes else header["bitrate"]
+        return info
+
+    # no VBR header: walk the frame headers to the end
+    total_bits = 0
+    samples = 0
+    while True:
+        h = parse_header(data[pos:pos + 4])
+        if h is None or h["length"] <= 0:
+            break
+        samples += h["samples"]
+        total_bits += h["bitrate"] * h["samples"] / h["sample_rate"]
+        pos += h["length"]
+
+    duration = samples / rate
+    info["duration"] = duration
+    info["bitrate"] = round(total_bits / duration) if duration else header["bitrate"]
+    return info
+
+
+# -------------------- METADATA CACHE --------------------------
+
+class MetadataCache:
+    """
+    probe() results keyed by path, reused while mtime and size match.
+    """
+
+    def __init__(self, path=META_CACHE_FILE):
+        self.path = path
+        self.entries = None
+        self.lock = threading.Lock()
+        self.dirty = False
+
+    def _load(self):
+        if self.entries is None:
+            try:
+                with open(self.path, "r", encoding="utf8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def save(self):
+        with self.lock:
+            if self.entries is None or not self.dirty:
+                return
+            atomic_write(self.path, json.dumps(self.entries, separators=(",", ":")))
+            self.dirty = False
+
+    @staticmethod
+    def _stamp(path):
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    def cached(self, path):
+        """
+        Cache entry {"stamp", "info"} if still valid, else None.
+        info is None for files that aren't MP3 streams.
+        """
+        key = os.path.abspath(path)
+        with self.lock:
+            self._load()
+            entry = self.entries.get(key)
+        if entry and tuple(entry["stamp"]) == self._stamp(path):
+            return entry
+        return None
+
+    def store(self, path, info, stamp=None):
+        with self.lock:
+            self._load()
+            self.entries[os.path.abspath(path)] = {
+                "stamp": list(stamp or self._stamp(path)),
+                "info": info,
+            }
+            self.dirty = True
+
+    def get(self, path):
+        """
+        Metadata for one file, probing it on a cache miss. The new
+        entry is written out with the rest at exit (or the next save).
+        """
+        entry = self.cached(path)
+        if entry is not None:
+            return entry["info"]
+        info = probe(path)
+        self.store(path, info)
+        return info
+
+
+META_CACHE = MetadataCache()
+atexit.register(META_CACHE.save)
+
+
+def track_info(path):
+    return META_CACHE.get(path)
+
+
+def track_duration(path):
+    """
+    Real length in seconds, or None if the file can't be probed.
+    """
+    try:
+        info = META_CACHE.get(path)
+    except OSError:
+        return None
+    return info["duration"] if info else None
+
+
+# -------------------- BATCH MODE ------------------------------
+
+def _probe_job(path):
+    try:
+        return path, MetadataCache._stamp(path), probe(path)
+    except OSError:
+        return path, None, None
+
+
+def probe_library(folder, workers=None):
+    """
+    Probe every MP3 under folder in parallel, skipping files whose
+    cache entry is still valid. Returns {path: info}.
+    """
+    paths = []
+    for root, _, files in os.walk(folder):
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(".mp3"))
+
+    results = {}
+    todo = []
+    for path in paths:
+        entry = META_CACHE.cached(path)
+        if entry is None:
+            todo.append(path)
+        else:
+            results[path] = entry["info"]
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, stamp, info in pool.map(_probe_job, todo, chunksize=32):
+                if stamp is not None:
+                    META_CACHE.store(path, info, stamp)
+                    results[path] = info
+        META_CACHE.save()
+
+    return results
+
+
+def main():
+    """
+    python mp3info.py [folder]
+    """
+    folder = sys.argv[1] if len(sys.argv) > 1 else "mp3"
+    found = probe_library(folder)
+    for path, info in sorted(found.items()):
+        if info:
+            print(f"{path}: {info['duration']:.1f}s  {info['bitrate'] // 1000} kbps  "
+                  f"{info['sample_rate']} Hz")
+        else:
+            print(f"{path}: not an MP3 stream")
+
+
+if __name__ == "__main__":
+    main()
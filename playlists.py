@@ -1,6 +1,7 @@
 import json
-from database import load_playlists, save_playlists
+from database import load_user_playlists, save_user_playlists as store_user_playlists
 from ui import box, banner
+from utils import find_song
 
 
 # -------------------------------------------------------------
@@ -11,14 +12,11 @@ from ui import box, banner
 # --------------------- LOAD / SAVE ---------------------------
 
 def get_user_playlists(username):
-    data = load_playlists()
-    return data.get(username, {})
+    return load_user_playlists(username)
 
 
 def save_user_playlists(username, playlists):
-    data = load_playlists()
-    data[username] = playlists
-    save_playlists(data)
+    store_user_playlists(username, playlists)
 
 
 # --------------------- BASIC PLAYLIST OPS ---------------------
@@ -139,7 +137,7 @@ def print_playlists(username, songs):
             continue
 
         for mid in ids:
-            song = next((s for s in songs if s["MusicID"] == mid), None)
+            song = find_song(songs, mid)
             if song:
                 print(f"  {song['MusicID']}. {song['Title']} - {song['Artist']}")
             else:
@@ -0,0 +1,218 @@
+import os
+import time
+import threading
+from collections import deque
+from database import load_user, save_user
+
+
+# -------------------------------------------------------------
+# MUSIT 5.0 — TASTE PROFILES
+# -------------------------------------------------------------
+#
+# Running genre/artist play counts and mean track duration per
+# user, updated once per play instead of re-derived from the whole
+# history on every recommendation. Stored as "taste" in the user
+# record.
+
+# "classic" scores every play the same and only avoids the last song;
+# "recency" decays old plays and penalizes the last RECENT_PLAYS tracks
+AI_SCORING = os.environ.get("MUSIT_AI_SCORING", "classic")
+
+# half-life of a play's weight in days; 0 = every play counts the same
+TASTE_HALF_LIFE_DAYS = float(os.environ.get(
+    "MUSIT_TASTE_HALF_LIFE", "30" if AI_SCORING == "recency" else "0"
+))
+
+RECENT_PLAYS = int(os.environ.get("MUSIT_RECENT_PLAYS", "10"))
+RECENT_PENALTY = 5  # for the song just played; older ones fade linearly
+
+RESCALE_AT = 1e12  # renormalize decayed weights before floats lose precision
+
+
+class TasteProfile:
+    """
+    Counters for one user's plays.
+    With decay on, a play at time t gets weight 2**((t - ref) / half_life):
+    newer plays weigh more, and no stored counter ever has to be aged.
+    stats() divides by the weight at "now".
+    """
+
+    def __init__(self, half_life_days=TASTE_HALF_LIFE_DAYS):
+        self.half_life = half_life_days * 86400
+        self.genre = {}
+        self.artist = {}
+        self.duration_sum = 0.0
+        self.weight_sum = 0.0
+        self.count = 0      # raw number of plays folded in
+        self.ref = None     # decay reference time
+        self.recent = deque(maxlen=RECENT_PLAYS)  # last MusicIDs, newest last
+        self.lock = threading.Lock()  # prefetch worker reads while we play
+
+    def _weight(self, t):
+        if not self.half_life:
+            return 1
+        if self.ref is None:
+            self.ref = t
+        w = 2 ** ((t - self.ref) / self.half_life)
+        if w > RESCALE_AT:
+            self._rescale(t)
+            w = 1.0
+        return w
+
+    def _rescale(self, t):
+        """Move ref to t, shrinking every stored weight to match."""
+        factor = 2 ** (-(t - self.ref) / self.half_life)
+        for table in (self.genre, self.artist):
+            for k in table:
+                table[k] *= factor
+        self.duration_sum *= factor
+        self.weight_sum *= factor
+        self.ref = t
+
+    def update(self, entry):
+        """
+        Fold in one history entry. O(1).
+        """
+        with self.lock:
+            w = self._weight(entry.get("timestamp") or 0)
+            self.genre[entry["genre"]] = self.genre.get(entry["genre"], 0) + w
+            self.artist[entry["artist"]] = self.artist.get(entry["artist"], 0) + w
+            self.duration_sum += w * entry["duration"]
+            self.weight_sum += w
+            self.count += 1
+            self.recent.append(entry["id"])
+
+    def stats(self, now=None):
+        """
+        (genre_freq, artist_freq, avg_duration), like ai.history_stats().
+        Without decay the numbers are identical to it.
+        """
+        with self.lock:
+            if not self.weight_sum:
+                return {}, {}, 0
+
+            avg_duration = self.duration_sum / self.weight_sum
+            if not self.half_life:
+                return dict(self.genre), dict(self.artist), avg_duration
+
+            # express weights relative to a play happening right now
+            factor = 2 ** (-((now or time.time()) - self.ref) / self.half_life)
+            genre = {k: v * factor for k, v in self.genre.items()}
+            artist = {k: v * factor for k, v in self.artist.items()}
+            return genre, artist, avg_duration
+
+    def recent_penalties(self):
+        """
+        {MusicID: penalty} for the ring buffer of recent plays:
+        RECENT_PENALTY for the newest, fading to RECENT_PENALTY / N.
+        A song played twice keeps its larger penalty.
+        """
+        with self.lock:
+            recent = list(self.recent)
+
+        penalties = {}
+        n = self.recent.maxlen
+        for age, song_id in enumerate(reversed(recent)):
+            penalties.setdefault(song_id, RECENT_PENALTY * (n - age) / n)
+        return penalties
+
+    @classmethod
+    def from_history(cls, history, half_life_days=TASTE_HALF_LIFE_DAYS):
+        profile = cls(half_life_days)
+        for entry in history:
+            profile.update(entry)
+        return profile
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "half_life": self.half_life,
+                "genre": dict(self.genre),
+                "artist": dict(self.artist),
+                "duration_sum": self.duration_sum,
+                "weight_sum": self.weight_sum,
+                "count": self.count,
+                "ref": self.ref,
+                "recent": list(self.recent),
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        profile = cls(data["half_life"] / 86400)
+        profile.genre = dict(data["genre"])
+        profile.artist = dict(data["artist"])
+        profile.duration_sum = data["duration_sum"]
+        profile.weight_sum = data["weight_sum"]
+        profile.count = data["count"]
+        profile.ref = data["ref"]
+        profile.recent.extend(data.get("recent", []))
+        return profile
+
+
+class TasteStore:
+    """
+    Profiles of the users seen this session. Loaded from the user
+    record, rebuilt from history when they disagree (history cleared,
+    a crash before the last save, decay setting changed), and
+    written back by flush().
+    """
+
+    def __init__(self):
+        self._profiles = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def _cached(self, username):
+        """
+        The profile in memory, else the one saved in the user record
+        if it was built with the current decay setting. Caller holds
+        the lock.
+        """
+        profile = self._profiles.get(username)
+        if profile is None:
+            record = load_user(username) or {}
+            if "taste" in record:
+                profile = TasteProfile.from_dict(record["taste"])
+        if profile is not None and profile.half_life != TASTE_HALF_LIFE_DAYS * 86400:
+            return None
+        return profile
+
+    def get(self, username, history):
+        """
+        The user's profile, checked against their history length.
+        """
+        with self._lock:
+            profile = self._cached(username)
+            if profile is None or profile.count != len(history):
+                profile = TasteProfile.from_history(history)
+                self._dirty.add(username)
+
+            self._profiles[username] = profile
+            return profile
+
+    def record(self, username, entry, history):
+        """
+        Fold a play that was just appended to history into the profile.
+        """
+        with self._lock:
+            profile = self._cached(username)
+            if profile is not None and profile.count == len(history) - 1:
+                profile.update(entry)
+                self._profiles[username] = profile
+                self._dirty.add(username)
+                return
+        self.get(username, history)
+
+    def flush(self):
+        """
+        Save changed profiles into their user records.
+        """
+        with self._lock:
+            dirty = [(u, self._profiles[u].to_dict()) for u in self._dirty]
+            self._dirty.clear()
+
+        for username, data in dirty:
+            record = load_user(username)
+            if record is not None:
+                record["taste"] = data
+                save_user(username, record)
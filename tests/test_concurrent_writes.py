@@ -0,0 +1,99 @@
+import multiprocessing as mp
+import os
+import time
+
+import database
+from database import JSON_CACHE, JsonStorage
+
+
+# -------------------------------------------------------------
+# Many sessions writing the same data folder at once must not lose
+# updates. MUSIT_STRESS_PROCS / MUSIT_STRESS_ROUNDS scale it up.
+# -------------------------------------------------------------
+
+PROCS = int(os.environ.get("MUSIT_STRESS_PROCS", "8"))
+ROUNDS = int(os.environ.get("MUSIT_STRESS_ROUNDS", "30"))
+
+
+def shard_writer(args):
+    folder, w = args
+    database.HISTORY_COMPACT_EVERY = 50
+    st = JsonStorage(folder)
+    for i in range(ROUNDS):
+        pl = st.load_user_playlists("shared")
+        pl.setdefault("mix", []).append(w * 100000 + i)
+        pl.setdefault(f"own{w}", []).append(i)
+        st.save_user_playlists("shared", pl)
+
+        rec = st.load_user("shared") or {"password": "x"}
+        rec[f"w{w}"] = i
+        st.save_user("shared", rec)
+
+        st.append_history(f"u{w % 4}", {"id": i, "w": w, "timestamp": time.time()})
+        if i % 7 == 0:
+            st.compact_history()
+    st.wait_for_compaction()
+    return JSON_CACHE.stats()
+
+
+def bulk_writer(args):
+    folder, w = args
+    st = JsonStorage(folder)
+    for i in range(ROUNDS):
+        users = st.load_users()
+        users.setdefault(f"user{w}", {"password": "x"})["plays"] = i
+        users["shared"][f"w{w}"] = i
+        st.save_users(users)
+
+
+def run(worker, folder):
+    with mp.Pool(PROCS) as pool:
+        return pool.map(worker, [(folder, w) for w in range(PROCS)])
+
+
+def leftovers(folder):
+    return [f for _, _, files in os.walk(folder) for f in files
+            if f.endswith((".tmp", ".compacting"))]
+
+
+def test_concurrent_shard_and_history_writers(tmp_path):
+    folder = str(tmp_path / "data")
+    JsonStorage(folder).ensure()
+
+    run(shard_writer, folder)
+
+    st = JsonStorage(folder)
+    pl = st.load_user_playlists("shared")
+    assert sorted(pl["mix"]) == sorted(w * 100000 + i for w in range(PROCS) for i in range(ROUNDS))
+    for w in range(PROCS):
+        assert pl[f"own{w}"] == list(range(ROUNDS))
+
+    rec = st.load_user("shared")
+    for w in range(PROCS):
+        assert rec[f"w{w}"] == ROUNDS - 1
+
+    st.compact_history()
+    history = st.load_history()
+    assert sum(len(v) for v in history.values()) == PROCS * ROUNDS
+    for username, entries in history.items():
+        for w in range(PROCS):
+            if f"u{w % 4}" == username:
+                assert [e["id"] for e in entries if e["w"] == w] == list(range(ROUNDS))
+
+    assert leftovers(folder) == []
+
+
+def test_concurrent_save_users(tmp_path):
+    folder = str(tmp_path / "data")
+    st = JsonStorage(folder)
+    st.ensure()
+    st.save_user("shared", {"password": "x"})
+
+    run(bulk_writer, folder)
+
+    users = JsonStorage(folder).load_users()
+    for w in range(PROCS):
+        assert users[f"user{w}"]["plays"] == ROUNDS - 1
+        assert users["shared"][f"w{w}"] == ROUNDS - 1
+
+    assert leftovers(folder) == []
@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ai import FeatureMatrix, ai_score, history_stats, similarity  # noqa: E402
+
+
+# -------------------------------------------------------------
+# FeatureMatrix must score exactly like similarity() / ai_score()
+# -------------------------------------------------------------
+
+def random_catalog(rng, n):
+    genres = [f"Genre{i}" for i in range(rng.randint(1, 12))]
+    artists = [f"Artist{i}" for i in range(rng.randint(1, 40))]
+    return [
+        {
+            "MusicID": i + 1,
+            "Title": f"Song {i}",
+            "Artist": rng.choice(artists),
+            "Genre": rng.choice(genres),
+            "Duration": rng.randint(60, 600),
+        }
+        for i in range(n)
+    ]
+
+
+def random_history(rng, songs, n):
+    history = []
+    for _ in range(n):
+        s = rng.choice(songs)
+        history.append({
+            "id": s["MusicID"], "title": s["Title"], "artist": s["Artist"],
+            "genre": s["Genre"], "duration": s["Duration"],
+        })
+    return history
+
+
+SEEDS = range(20)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_similarity_scores_match_scalar(seed):
+    rng = random.Random(seed)
+    songs = random_catalog(rng, rng.randint(1, 300))
+    features = FeatureMatrix(songs)
+
+    targets = rng.sample(songs, min(5, len(songs)))
+    # a song from outside the catalog: unknown genre and artist
+    targets.append({"MusicID": -1, "Title": "x", "Artist": "Nobody",
+                    "Genre": "Nothing", "Duration": 200})
+
+    for target in targets:
+        expected = [similarity(target, s) for s in songs]
+        assert features.similarity_scores(target).tolist() == expected
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_similar_matches_scalar_ranking(seed):
+    rng = random.Random(seed)
+    songs = random_catalog(rng, rng.randint(2, 300))
+    features = FeatureMatrix(songs)
+
+    for target in rng.sample(songs, min(5, len(songs))):
+        top_n = rng.randint(1, 12)
+        scored = [(similarity(target, s), s) for s in songs
+                  if s["MusicID"] != target["MusicID"]]
+        scored.sort(reverse=True, key=lambda x: x[0])
+        expected = [s["MusicID"] for _, s in scored[:top_n]]
+
+        assert [s["MusicID"] for s in features.similar(target, top_n)] == expected
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_ai_scores_match_scalar(seed):
+    rng = random.Random(seed)
+    songs = random_catalog(rng, rng.randint(1, 300))
+    history = random_history(rng, songs, rng.randint(5, 60))
+    genre_freq, artist_freq, avg_duration = history_stats(history)
+    features = FeatureMatrix(songs)
+
+    recent_options = [None, {h["id"]: rng.uniform(0, 5) for h in history[-5:]}]
+    for recent in recent_options:
+        expected = [ai_score(s, history, genre_freq, artist_freq, avg_duration, recent)
+                    for s in songs]
+        scores = features.ai_scores(history, genre_freq, artist_freq, avg_duration, recent)
+        assert scores.tolist() == expected
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_recommend_picks_a_scalar_best(seed):
+    rng = random.Random(seed)
+    songs = random_catalog(rng, rng.randint(1, 300))
+    history = random_history(rng, songs, rng.randint(5, 60))
+    stats = history_stats(history)
+
+    scored = [ai_score(s, history, *stats) for s in songs]
+    best = {s["MusicID"] for s, sc in zip(songs, scored) if sc == max(scored)}
+
+    random.seed(seed)
+    assert FeatureMatrix(songs).recommend(history, stats)["MusicID"] in best
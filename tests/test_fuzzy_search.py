@@ -0,0 +1,77 @@
+import random
+from difflib import get_close_matches
+
+from ai import TrigramIndex, fuzzy_search
+
+
+# -------------------------------------------------------------
+# TrigramIndex vs a full get_close_matches scan, at catalog scale
+# -------------------------------------------------------------
+
+CATALOG_SIZE = 12000
+
+
+def pseudo_word(rng):
+    return "".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiouy")
+                   for _ in range(rng.randint(1, 4)))
+
+
+def synthetic_titles(rng, n):
+    vocab = [pseudo_word(rng) for _ in range(800)]
+    titles = set()
+    while len(titles) < n:
+        titles.add(" ".join(rng.choice(vocab) for _ in range(rng.randint(1, 5))).title())
+    return sorted(titles)
+
+
+def typo(rng, text):
+    chars = list(text)
+    for _ in range(rng.randint(1, 2)):
+        i = rng.randrange(len(chars))
+        op = rng.randrange(3)
+        if op == 0 and len(chars) > 1:
+            del chars[i]
+        elif op == 1:
+            chars.insert(i, rng.choice("abcdefghijklmnopqrstuvwxyz"))
+        else:
+            chars[i] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return "".join(chars)
+
+
+def test_close_matches_agree_with_full_scan():
+    rng = random.Random(6)
+    titles = synthetic_titles(rng, CATALOG_SIZE)
+    index = TrigramIndex(titles)
+
+    queries = [typo(rng, rng.choice(titles)) for _ in range(60)]
+    queries += [rng.choice(titles).split()[0] for _ in range(20)]
+
+    top_same = list_same = 0
+    for query in queries:
+        expected = get_close_matches(query, titles, n=3, cutoff=0.55)
+        found = index.close_matches(query, n=3, cutoff=0.55)
+        top_same += found[:1] == expected[:1]
+        list_same += found == expected
+
+    # misses are near-ties among weak matches that fall off the shortlist
+    assert top_same >= 0.97 * len(queries)
+    assert list_same >= 0.85 * len(queries)
+
+
+def test_close_matches_exact_title_first():
+    rng = random.Random(7)
+    titles = synthetic_titles(rng, 2000)
+    index = TrigramIndex(titles)
+
+    for title in rng.sample(titles, 50):
+        assert index.close_matches(title, n=3)[0] == title
+
+
+def test_fuzzy_search_titles_and_artists():
+    songs = [
+        {"MusicID": 1, "Title": "Espresso", "Artist": "Sabrina Carpenter", "Genre": "Pop", "Duration": 175},
+        {"MusicID": 2, "Title": "Greedy", "Artist": "Tate McRae", "Genre": "Pop", "Duration": 131},
+        {"MusicID": 3, "Title": "Houdini", "Artist": "Dua Lipa", "Genre": "Pop", "Duration": 185},
+    ]
+    assert [s["MusicID"] for s in fuzzy_search("Espreso", songs)] == [1]
+    assert [s["MusicID"] for s in fuzzy_search("Dua Lipaa", songs)] == [3]
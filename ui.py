@@ -1,11 +1,20 @@
 import os
+import sys
 import time
 import shutil
 import random
 
+if os.name == "nt":
+    import msvcrt
+else:
+    import select
+
 # Check terminal size for adaptive layout
 TERMINAL_WIDTH = shutil.get_terminal_size((80, 20)).columns
 
+# Frames per second for in-place screens (playback)
+RENDER_FPS = float(os.environ.get("MUSIT_FPS", "7"))
+
 
 # -------------- COLOR SUPPORT -----------------
 
@@ -31,6 +40,58 @@ def clear():
     os.system("cls" if os.name == "nt" else "clear")
 
 
+# -------------- IN-PLACE RENDERER --------------
+
+class ScreenRenderer:
+    """
+    Draws a full-screen layout in place.
+    The screen is cleared once; after that each frame rewrites only
+    the lines that changed, using ANSI cursor positioning, in one
+    buffered write. Frames above the frame rate are skipped.
+    """
+
+    def __init__(self, fps=RENDER_FPS, out=None):
+        self.interval = 1.0 / fps
+        self.out = out or sys.stdout
+        self.lines = []
+        self.last_frame = 0.0
+
+    def start(self):
+        if os.name == "nt":
+            os.system("")  # turn on ANSI escape handling in the console
+        self.out.write("\033[2J\033[H")
+        self.out.flush()
+        self.lines = []
+        self.last_frame = 0.0
+
+    def render(self, lines, force=False):
+        """
+        Show lines; returns False if the frame was skipped.
+        """
+        now = time.time()
+        if not force and now - self.last_frame < self.interval:
+            return False
+        self.last_frame = now
+
+        lines = [text[:TERMINAL_WIDTH] for text in lines]
+        buf = []
+
+        for row, text in enumerate(lines):
+            if row >= len(self.lines) or self.lines[row] != text:
+                buf.append(f"\033[{row + 1};1H{text}\033[K")
+
+        for row in range(len(lines), len(self.lines)):
+            buf.append(f"\033[{row + 1};1H\033[K")
+
+        # park the cursor under the layout, where typed keys echo
+        buf.append(f"\033[{len(lines) + 1};1H")
+
+        self.out.write("".join(buf))
+        self.out.flush()
+        self.lines = lines
+        return True
+
+
 # -------------- BIG BANNER ---------------------
 
 def banner(text):
@@ -110,6 +171,25 @@ def prompt(text):
     return input("> ")
 
 
+def poll_line(timeout=0):
+    """
+    Non-blocking input: a typed line if one is ready within
+    timeout seconds, else None.
+    """
+    if os.name == "nt":
+        deadline = time.time() + timeout
+        while not msvcrt.kbhit():
+            if time.time() >= deadline:
+                return None
+            time.sleep(0.02)
+        return input()
+
+    ready, _, _ = select.select([sys.stdin], [], [], timeout)
+    if not ready:
+        return None
+    return sys.stdin.readline().rstrip("\n")
+
+
 # -------------- SMALL HELPERS ------------------
 
 def line():
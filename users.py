@@ -1,6 +1,6 @@
 import hashlib
 import time
-from database import load_users, save_users
+from database import load_users, save_users, load_user, save_user
 from ui import box, banner, prompt
 
 
@@ -28,29 +28,34 @@ def save_user_db(users):
     save_users(users)
 
 
+def get_user(username):
+    return load_user(username)
+
+
+def save_user_record(username, record):
+    save_user(username, record)
+
+
 # ---------------- CREATE ACCOUNT ------------------------------
 
 def create_account():
     banner(" CREATE NEW ACCOUNT ")
 
-    users = get_users()
     username = prompt("Choose a username")
 
-    if username in users:
+    if get_user(username) is not None:
         box("Username already exists.")
         return None
 
     password = prompt("Choose a password")
     hashed = encode_password(password)
 
-    users[username] = {
+    save_user_record(username, {
         "password": hashed,
         "created": time.time(),
         "is_admin": False,
         "preferences": {},
-    }
-
-    save_user_db(users)
+    })
     box("Account created successfully!")
     return username
 
@@ -60,17 +65,17 @@ def create_account():
 def login():
     banner(" LOGIN ")
 
-    users = get_users()
     username = prompt("Username")
+    user = get_user(username)
 
-    if username not in users:
+    if user is None:
         box("User not found.")
         return None
 
     password = prompt("Password")
     hashed = encode_password(password)
 
-    if hashed != users[username]["password"]:
+    if hashed != user["password"]:
         box("Incorrect password.")
         return None
 
@@ -84,45 +89,43 @@ def ensure_admin_exists():
     """
     Creates a default admin account if none exists.
     """
-    users = get_users()
-    if "admin" not in users:
-        users["admin"] = {
+    if get_user("admin") is None:
+        save_user_record("admin", {
             "password": encode_password("admin123"),
             "is_admin": True,
             "created": time.time(),
             "preferences": {}
-        }
-        save_user_db(users)
+        })
 
 
 # ---------------- IS ADMIN? -----------------------------------
 
 def is_admin(username):
-    users = get_users()
-    if username not in users:
+    user = get_user(username)
+    if user is None:
         return False
-    return users[username].get("is_admin", False)
+    return user.get("is_admin", False)
 
 
 # ---------------- CHANGE PASSWORD ------------------------------
 
 def change_password(username):
-    users = get_users()
-    if username not in users:
+    user = get_user(username)
+    if user is None:
         box("User not found.")
         return False
 
     banner(" CHANGE PASSWORD ")
 
     old = prompt("Old password")
-    if encode_password(old) != users[username]["password"]:
+    if encode_password(old) != user["password"]:
         box("Incorrect old password.")
         return False
 
     new = prompt("New password")
-    users[username]["password"] = encode_password(new)
+    user["password"] = encode_password(new)
 
-    save_user_db(users)
+    save_user_record(username, user)
     box("Password updated!")
     return True
 
@@ -130,17 +133,17 @@ def change_password(username):
 # ---------------- USER PREFERENCES -----------------------------
 
 def set_preference(username, key, value):
-    users = get_users()
-    if username not in users:
+    user = get_user(username)
+    if user is None:
         return
 
-    users[username]["preferences"][key] = value
-    save_user_db(users)
+    user["preferences"][key] = value
+    save_user_record(username, user)
 
 
 def get_preference(username, key, default=None):
-    users = get_users()
-    if username not in users:
+    user = get_user(username)
+    if user is None:
         return default
 
-    return users[username]["preferences"].get(key, default)
+    return user["preferences"].get(key, default)
@@ -1,6 +1,7 @@
 import random
 import math
 from ui import box
+from catalog import CatalogIndex, PrefixIndex
 
 
 # -------------------------------------------------------------
@@ -41,7 +42,11 @@ def input_int(prompt_text, default=None):
 def find_song(songs, song_id):
     """
     Find song by ID.
+    Uses the MusicID index when given a Catalog.
     """
+    if isinstance(songs, CatalogIndex):
+        return songs.find_id(song_id)
+
     for s in songs:
         if s["MusicID"] == song_id:
             return s
@@ -52,6 +57,9 @@ def find_song_by_title(songs, title):
     """
     Case-insensitive title search.
     """
+    if isinstance(songs, CatalogIndex):
+        return songs.find_title(title)
+
     title = title.lower()
     for s in songs:
         if s["Title"].lower() == title:
@@ -59,6 +67,37 @@ def find_song_by_title(songs, title):
     return None
 
 
+def find_songs_by_artist(songs, text):
+    """
+    Case-insensitive substring search on artist.
+    """
+    if isinstance(songs, CatalogIndex):
+        return songs.search_artist(text)
+
+    text = text.lower()
+    return [s for s in songs if text in s["Artist"].lower()]
+
+
+def find_songs_by_genre(songs, text):
+    """
+    Case-insensitive substring search on genre.
+    """
+    if isinstance(songs, CatalogIndex):
+        return songs.search_genre(text)
+
+    text = text.lower()
+    return [s for s in songs if text in s["Genre"].lower()]
+
+
+def autocomplete(songs, prefix, n=10):
+    """
+    Top n title/artist completions for a typed prefix,
+    plus the songs they belong to.
+    """
+    index = songs.prefix_index() if isinstance(songs, CatalogIndex) else PrefixIndex(songs)
+    return index.complete(prefix, n), index.songs_with_prefix(prefix, n)
+
+
 # -------------------- RANDOM UTILITIES --------------------------
 
 def random_choice(lst):
@@ -86,16 +125,22 @@ def lerp(a, b, t):
 
 # -------------------- SORTING HELPERS ---------------------------
 
+def sort_songs(songs, field):
+    if isinstance(songs, CatalogIndex):
+        return songs.sort_by(field)
+    return sorted(songs, key=lambda s: s[field])
+
+
 def sort_songs_by_title(songs):
-    return sorted(songs, key=lambda s: s["Title"])
+    return sort_songs(songs, "Title")
 
 
 def sort_songs_by_duration(songs):
-    return sorted(songs, key=lambda s: s["Duration"])
+    return sort_songs(songs, "Duration")
 
 
 def sort_songs_by_artist(songs):
-    return sorted(songs, key=lambda s: s["Artist"])
+    return sort_songs(songs, "Artist")
 
 
 # -------------------- MOOD NORMALIZATION -------------------------
@@ -0,0 +1,204 @@
+import os
+import json
+import random
+import hashlib
+import queue
+import threading
+import pygame # type: ignore
+from database import DATA_DIR
+
+try:
+    import numpy as np  # optional: real spectrum analysis
+except ImportError:
+    np = None
+
+
+# -------------------------------------------------------------
+# MUSIT 5.0 — AUDIO VISUALIZER
+# -------------------------------------------------------------
+
+VISUAL_DIR = os.path.join(DATA_DIR, "visuals")
+WAVE_STYLES_FILE = "assets/wave_styles.json"
+WAVE_STYLE = os.environ.get("MUSIT_WAVE_STYLE", "blocks")
+
+VISUAL_FPS = 20      # analysis frames per second of audio
+VISUAL_BANDS = 30    # frequency bands shown side by side
+CHUNK_FRAMES = 256   # frames analysed per FFT batch (bounds memory)
+
+DEFAULT_STYLES = {
+    "classic": {"type": "runs", "char": "*", "height": 10, "separator": " "},
+    "blocks": {"type": "levels", "chars": " ▁▂▃▄▅▆▇█", "separator": ""},
+}
+
+
+# -------------------- STYLES ---------------------------------
+
+_styles = None
+
+
+def wave_styles():
+    """
+    Styles from assets/wave_styles.json, or the built-in defaults.
+    """
+    global _styles
+    if _styles is None:
+        try:
+            with open(WAVE_STYLES_FILE, "r", encoding="utf8") as f:
+                _styles = json.load(f)
+        except (OSError, ValueError):
+            _styles = DEFAULT_STYLES
+    return _styles
+
+
+def render_levels(levels, style_name=WAVE_STYLE):
+    """
+    One text line for a frame of band levels (0-255).
+    """
+    styles = wave_styles()
+    style = styles.get(style_name) or next(iter(styles.values()))
+    sep = style.get("separator", "")
+
+    if style["type"] == "runs":
+        height = style.get("height", 10)
+        return sep.join(style["char"] * (1 + int(v) * (height - 1) // 255) for v in levels)
+
+    chars = style["chars"]
+    return sep.join(chars[int(v) * (len(chars) - 1) // 255] for v in levels)
+
+
+def random_levels(bands=VISUAL_BANDS):
+    """
+    Placeholder frame while a track is still being analysed.
+    """
+    return [random.randint(0, 255) for _ in range(bands)]
+
+
+# -------------------- ANALYSIS -------------------------------
+
+def band_levels(samples, rate, fps=VISUAL_FPS, bands=VISUAL_BANDS):
+    """
+    Per-frame FFT band energies of a PCM array, scaled to 0-255.
+    Returns a uint8 array of shape (frames, bands).
+    Samples are converted to float one chunk at a time, never whole.
+    """
+    frame_len = max(1, int(rate / fps))
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.zeros((0, bands), dtype=np.uint8)
+
+    frames = samples[:n_frames * frame_len].reshape((n_frames, frame_len) + samples.shape[1:])
+    window = np.hanning(frame_len).astype(np.float32)
+
+    # log-spaced band edges over the audible range, as rfft bin indexes
+    freqs = np.fft.rfftfreq(frame_len, 1.0 / rate)
+    edges = np.searchsorted(freqs, np.geomspace(40, min(16000, rate / 2), bands + 1))
+    edges = np.maximum(edges, np.arange(bands + 1) + 1)
+    edges = np.minimum(edges, len(freqs))
+
+    energy = np.zeros((n_frames, bands), dtype=np.float32)
+    for start in range(0, n_frames, CHUNK_FRAMES):
+        chunk = frames[start:start + CHUNK_FRAMES].astype(np.float32)
+        if chunk.ndim > 2:
+            chunk = chunk.mean(axis=2)  # mono
+        spectrum = np.abs(np.fft.rfft(chunk * window, axis=1))
+        for b in range(bands):
+            lo, hi = edges[b], max(edges[b + 1], edges[b] + 1)
+            energy[start:start + CHUNK_FRAMES, b] = spectrum[:, lo:hi].mean(axis=1)
+
+    energy = np.log1p(energy)
+    peak = np.percentile(energy, 99) or 1.0
+    return (np.clip(energy / peak, 0, 1) * 255).astype(np.uint8)
+
+
+def _cache_path(path):
+    st = os.stat(path)
+    key = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{VISUAL_FPS}|{VISUAL_BANDS}"
+    return os.path.join(VISUAL_DIR, hashlib.sha1(key.encode()).hexdigest() + ".npy")
+
+
+def analyse(path, sound=None):
+    """
+    Band levels for a track, from the disk cache or by decoding it.
+    """
+    cache = _cache_path(path)
+    try:
+        return np.load(cache)
+    except (OSError, ValueError):
+        pass
+
+    if sound is None:
+        sound = pygame.mixer.Sound(path)
+    rate = pygame.mixer.get_init()[0]
+    # samples() views the Sound's buffer; array() would copy all the PCM
+    levels = band_levels(pygame.sndarray.samples(sound), rate)
+
+    os.makedirs(VISUAL_DIR, exist_ok=True)
+    tmp = cache + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, levels)
+    os.replace(tmp, cache)
+    return levels
+
+
+# -------------------- PER-TRACK CACHE -------------------------
+
+class Visualizer:
+    """
+    Band levels per track, computed once on a single background
+    worker. Playback only indexes into the precomputed array.
+    """
+
+    def __init__(self):
+        self.tracks = {}    # path -> levels array
+        self.pending = set()
+        self.jobs = queue.Queue()  # (path, sound) waiting for the worker
+        self.worker = None
+        self.lock = threading.Lock()
+
+    def prepare(self, path, sound=None):
+        """
+        Queue a track for analysis if it isn't ready or queued yet.
+        """
+        if np is None:
+            return
+        with self.lock:
+            if path in self.tracks or path in self.pending:
+                return
+            self.pending.add(path)
+            self.jobs.put((path, sound))
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self._run, daemon=True)
+                self.worker.start()
+
+    def _run(self):
+        while True:
+            path, sound = self.jobs.get()
+            self._analyse(path, sound)
+
+    def _analyse(self, path, sound):
+        try:
+            levels = analyse(path, sound)
+        except (OSError, ValueError, pygame.error):
+            levels = None
+        with self.lock:
+            self.pending.discard(path)
+            if levels is not None:
+                self.tracks[path] = levels
+
+    def frame(self, path, elapsed):
+        """
+        Band levels at a playback position (random until analysed).
+        The engine prepares each track once it has its decoded audio.
+        """
+        levels = self.tracks.get(path)
+        if levels is None or len(levels) == 0:
+            return random_levels()
+
+        row = min(int(elapsed * VISUAL_FPS), len(levels) - 1)
+        return levels[row]
+
+    def line(self, path, elapsed, style_name=WAVE_STYLE):
+        return render_levels(self.frame(path, elapsed), style_name)
+
+
+VISUALIZER = Visualizer()